@@ -1,45 +1,31 @@
 import time
 import csv
+from itertools import islice
 
-# Header for the final combined CSV
-combine_header = ['Date', 'Time', 'V1 (V)', 'A1 (A)', 'P1 (kW)', 'V2 (V)', 'A2 (A)', 'P2 (kW)', 'V3 (V)', 'A3 (A)', 'P3 (kW)', 'Total Power (kW)', 'DC Volt (V)', 'DC Current (A)', 'DC Power (W)', 'Efficiency']
+import numpy as np
 
-# Dictionaries to hold data from CSV files
-pm_data = {}
-com_data = {}
+import power_meter
+from timebase import asof_join, date_seconds, dates_to_seconds, time_seconds, times_to_seconds
 
-# Generate timestamp for the output filenames
-timestamp = time.strftime('%m%d%Y-%H%M%S')
+# Header for the final combined CSV, the power meter columns are the ones power_meter reads live
+combine_header = ['Date', 'Time'] + power_meter.header + ['DC Volt (V)', 'DC Current (A)', 'DC Power (W)', 'Efficiency']
 
-print('Enter name of Power Meter CSV (without .csv extension):')
-pm_csv_in = input().strip()  # Get user input and remove any leading/trailing whitespace
+# Power Meter export layout. Column A corresponds to 0, count to whichever letter.
+pm_skip_rows = 11  # rows before the data
+pm_min_columns = 27  # rows with fewer columns are skipped
+pm_date_column = 1  # col B
+pm_time_column = 2  # col C
+# Column of every power meter value, in the order of the combined CSV columns
+pm_columns = {'v1': 3, 'a1': 4, 'p1': 5,  # col D, E, F
+              'v2': 9, 'a2': 10, 'p2': 11,  # col J, K, L
+              'v3': 15, 'a3': 16, 'p3': 17,  # col P, Q, R
+              'total_power': 24}  # col Y
 
-# Validate input
-if not pm_csv_in:
-    print("Error: Power Meter CSV name cannot be empty.")
-    exit()
-pm_csv = f'{pm_csv_in}.csv'
-
-# Prompt the user for the name of the Multimeter CSV
-print('Enter name of Multimeter CSV (without .csv extension):')
-combined_csv_in = input().strip()  # Get user input and remove any leading/trailing whitespace
-
-# Validate input
-if not combined_csv_in:
-    print("Error: Multimeter CSV name cannot be empty.")
-    exit()
-combined_csv = f'{combined_csv_in}.csv'
-
-print('Enter a name for the output CSV (without .csv extension):')
-output_filename_in = input().strip()  # Get user input and remove any leading/trailing whitespace
-
-# Validate input
-if not output_filename_in:
-    print("Error: Output file CSV name cannot be empty.")
-    exit()
-output_filename = f'{output_filename_in}.csv'
-
-#output_filename = f'{timestamp}_combined_ACDC.csv' #default timestamp output filename
+# Match every multimeter row to the nearest power meter row within tolerance seconds (full date and time).
+# Set tolerance to None for the old exact HH:MM:SS match.
+tolerance = 1.0
+# Interpolate the power meter values to the multimeter time instead of taking the nearest row
+interpolate = False
 
 def convert_time(time_str):
     """
@@ -61,52 +47,113 @@ def convert_time(time_str):
     except ValueError:
         raise ValueError(f"Invalid time format: {time_str}")
 
-# Read Power Meter data
-# dumps power meter data into variables
-with open(pm_csv, 'r') as file:
-    pm_csvreader = csv.reader(file)
-    for _ in range(11):  # Skip the first 11 rows
-        next(pm_csvreader)
-    for value in pm_csvreader:
-        if len(value) > 26: #checks if there is enough columns to pull data from
-            time_val = convert_time(value[2])
-            pm_data[time_val] = { #column A corresponds to 0 and count to whichever letter and do the math
-                'date': value[1], #col B
-                'v1': float(value[3]), #col D
-                'a1': float(value[4]),
-                'p1': float(value[5]),
-                'v2': float(value[9]),
-                'a2': float(value[10]),
-                'p2': float(value[11]),
-                'v3': float(value[15]),
-                'a3': float(value[16]),
-                'p3': float(value[17]),
-                'total_power': float(value[24])
-            }
-
-# Read Combined DMM data
-# dumps multimeter data into variables
-with open(combined_csv, 'r') as file:
-    com_csvreader = csv.reader(file)
-    next(com_csvreader)  # Skip the header row
-    for value in com_csvreader:
-        if len(value) > 5: #checks if there are enough columns of data
-            time_val = convert_time(value[1])
-            com_data[time_val] = {
-                'date': value[0],
-                'volt': f"{float(value[2]):.3f}",
-                'current': f"{float(value[3]):.3f}",
-                'power': float(value[5])
-            }
-
-# Process and write combined data to the final CSV file
-with open(output_filename, 'w', newline='') as file:
-    csvwriter = csv.writer(file)
-    csvwriter.writerow(combine_header)  # Write header row
-
-    for com_time_val, com_info in com_data.items(): #this block compares the time of the data and takes the corresponding value and writes it to a new list
-        if com_time_val in pm_data:
-            pm_info = pm_data[com_time_val]
+
+def keyed_rows(rows):
+    """
+    Attach an ordering key to time-ordered (time, info) rows: (key, time, info).
+
+    The key is the row's date and time in seconds from 1970-01-01 (info['date'] and
+    the time), so both files line up across midnight wherever each one starts, and
+    9:05:03 and 09:05:03 are the same time. Rows with the same key are collapsed to
+    the last one, the same way one dict entry per time did.
+    """
+    pending = None
+    for time_val, info in rows:
+        key = date_seconds(info['date']) + time_seconds(time_val)
+        if pending is not None and pending[0] != key:
+            yield pending
+        pending = (key, time_val, info)
+    if pending is not None:
+        yield pending
+
+
+def read_power_meter(pm_csv):
+    """
+    Yield (time, data) for every row of the Power Meter export, one row at a time.
+    """
+    for _, time_val, pm_info in read_power_meter_dated(pm_csv):
+        yield time_val, pm_info
+
+
+def read_power_meter_dated(pm_csv):
+    """
+    Yield (date, time, data) for every row of the Power Meter export, one row at a time.
+    """
+    with open(pm_csv, 'r') as file:
+        pm_csvreader = csv.reader(file)
+        for _ in range(pm_skip_rows):
+            next(pm_csvreader)
+        for value in pm_csvreader:
+            if len(value) >= pm_min_columns: #checks if there is enough columns to pull data from
+                pm_info = {key: float(value[column]) for key, column in pm_columns.items()}
+                pm_info['date'] = value[pm_date_column]
+                yield value[pm_date_column], convert_time(value[pm_time_column]), pm_info
+
+
+def read_power_meter_arrays(pm_csv):
+    """
+    Read the Power Meter export in bulk into (times, values) NumPy arrays.
+
+    Rows with fewer than pm_min_columns columns are skipped, then numpy's C reader
+    parses only the pm_columns (as float64) and, in a second pass, the date and time
+    columns. times are seconds from 1970-01-01, values has one column per pm_columns entry.
+    """
+    with open(pm_csv, 'r') as file:
+        lines = [line for line in islice(file, pm_skip_rows, None) if line.count(',') >= pm_min_columns - 1]
+    if not lines:
+        return np.empty(0), np.empty((0, len(pm_columns)))
+
+    values = np.loadtxt(lines, delimiter=',', ndmin=2, usecols=list(pm_columns.values()))
+    stamps = np.loadtxt(lines, dtype=str, delimiter=',', ndmin=2, usecols=(pm_date_column, pm_time_column))
+    times = dates_to_seconds(stamps[:, 0]) + times_to_seconds(stamps[:, 1])
+    return times, values
+
+
+def read_multimeter(combined_csv):
+    """
+    Yield (time, data) for every row of the Dual DMM CSV, one row at a time.
+    """
+    with open(combined_csv, 'r') as file:
+        com_csvreader = csv.reader(file)
+        next(com_csvreader)  # Skip the header row
+        for value in com_csvreader:
+            if len(value) > 5: #checks if there are enough columns of data
+                yield convert_time(value[1]), {
+                    'date': value[0],
+                    'volt': f"{float(value[2]):.3f}",
+                    'current': f"{float(value[3]):.3f}",
+                    'power': float(value[5])
+                }
+
+
+def combine(pm_csv, combined_csv, output_filename):
+    """
+    Join the Power Meter and Dual DMM CSVs on time and write the combined CSV.
+
+    Both files are in time order, so they are read side by side (a merge join):
+    whichever side is behind is advanced until the times match, and every match
+    is written straight away. Only one row of each file is held in memory.
+    Returns (rows matched, multimeter rows without a matching power meter time).
+    """
+    matched = 0
+    dropped = 0
+    pm_rows = keyed_rows(read_power_meter(pm_csv))
+    pm_key, _, pm_info = next(pm_rows, (None, None, None))
+
+    with open(output_filename, 'w', newline='') as file:
+        csvwriter = csv.writer(file)
+        csvwriter.writerow(combine_header)  # Write header row
+
+        for com_key, com_time_val, com_info in keyed_rows(read_multimeter(combined_csv)):
+            # Advance the power meter until it catches up with the multimeter time
+            while pm_key is not None and pm_key < com_key:
+                pm_key, _, pm_info = next(pm_rows, (None, None, None))
+
+            if pm_key != com_key:
+                print(f"No matching time found for Time: {com_time_val}")
+                dropped += 1
+                continue
+
             efficiency = com_info['power'] / pm_info['total_power'] if pm_info['total_power'] != 0 else 0
 
             outrow = [
@@ -128,11 +175,106 @@ with open(output_filename, 'w', newline='') as file:
                 f"{efficiency:.4f}"  # Efficiency, formatted to 4 decimal places
             ]
             csvwriter.writerow(outrow) #writes matching data
-        else:
-            print(f"No matching time found for Time: {com_time_val}")
+            matched += 1
+
+    return matched, dropped
+
+
+def combine_asof(pm_csv, combined_csv, output_filename, tolerance=1.0, interpolate=False, chunk_rows=100000):
+    """
+    Join the Power Meter and Dual DMM CSVs on full date and time, allowing tolerance seconds of difference.
+
+    The power meter times and values are loaded into sorted arrays and every
+    multimeter row is matched with a binary search (np.searchsorted), so rows a
+    second apart are no longer dropped and multi-day runs don't collide. The
+    multimeter file is processed chunk_rows rows at a time.
+    Returns (rows matched, multimeter rows with no power meter time within tolerance).
+    """
+    pm_times, pm_values = read_power_meter_arrays(pm_csv)
+    order = np.argsort(pm_times, kind='stable')
+    pm_times = pm_times[order]
+    pm_values = pm_values[order]
+
+    matched = 0
+    dropped = 0
+    com_rows = read_multimeter(combined_csv)
+    with open(output_filename, 'w', newline='') as file:
+        csvwriter = csv.writer(file)
+        csvwriter.writerow(combine_header)  # Write header row
+
+        while True:
+            chunk = list(islice(com_rows, chunk_rows))
+            if not chunk:
+                break
+            if len(pm_times) == 0:
+                dropped += len(chunk)
+                continue
+
+            com_times = (dates_to_seconds([com_info['date'] for _, com_info in chunk])
+                         + times_to_seconds([time_val for time_val, _ in chunk]))
+            left, right, weight, ok = asof_join(pm_times, com_times, tolerance, interpolate)
+            values = pm_values[left] * (1 - weight[:, np.newaxis]) + pm_values[right] * weight[:, np.newaxis]
+
+            for k, (time_val, com_info) in enumerate(chunk):
+                if not ok[k]:
+                    print(f"No matching time found for Time: {com_info['date']} {time_val}")
+                    dropped += 1
+                    continue
+
+                pm_row = [round(float(value), 6) for value in values[k]]
+                total_power = pm_row[-1]
+                efficiency = com_info['power'] / total_power if total_power != 0 else 0
+                csvwriter.writerow([com_info['date'], time_val] + pm_row
+                                   + [com_info['volt'], com_info['current'], com_info['power'], f"{efficiency:.4f}"])
+                matched += 1
+
+    return matched, dropped
+
+
+if __name__ == '__main__':
+    # Generate timestamp for the output filenames
+    timestamp = time.strftime('%m%d%Y-%H%M%S')
+
+    print('Enter name of Power Meter CSV (without .csv extension):')
+    pm_csv_in = input().strip()  # Get user input and remove any leading/trailing whitespace
+
+    # Validate input
+    if not pm_csv_in:
+        print("Error: Power Meter CSV name cannot be empty.")
+        exit()
+    pm_csv = f'{pm_csv_in}.csv'
+
+    # Prompt the user for the name of the Multimeter CSV
+    print('Enter name of Multimeter CSV (without .csv extension):')
+    combined_csv_in = input().strip()  # Get user input and remove any leading/trailing whitespace
+
+    # Validate input
+    if not combined_csv_in:
+        print("Error: Multimeter CSV name cannot be empty.")
+        exit()
+    combined_csv = f'{combined_csv_in}.csv'
+
+    print('Enter a name for the output CSV (without .csv extension):')
+    output_filename_in = input().strip()  # Get user input and remove any leading/trailing whitespace
+
+    # Validate input
+    if not output_filename_in:
+        print("Error: Output file CSV name cannot be empty.")
+        exit()
+    output_filename = f'{output_filename_in}.csv'
+
+    #output_filename = f'{timestamp}_combined_ACDC.csv' #default timestamp output filename
+
+    if tolerance is None:
+        matched, dropped = combine(pm_csv, combined_csv, output_filename)
+    else:
+        matched, dropped = combine_asof(pm_csv, combined_csv, output_filename, tolerance, interpolate)
+
+    print('')
+    print(f'{matched} rows matched, {dropped} multimeter rows without a matching power meter time')
 
-print('')
-print(f'Processed combined data written to {output_filename}')
-print('')
-print('Press Enter to close')
-input()
\ No newline at end of file
+    print('')
+    print(f'Processed combined data written to {output_filename}')
+    print('')
+    print('Press Enter to close')
+    input()
\ No newline at end of file
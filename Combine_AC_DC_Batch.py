@@ -0,0 +1,151 @@
+"""
+Combine every Power Meter / Multimeter CSV pair of a test campaign in one run.
+
+Non-interactive version of Combine_AC_DC. The pairs come either from a folder
+(files named <name><pm suffix> and <name><dmm suffix>, e.g. Load1_PM.csv and
+Load1_DMM.csv) or from a manifest CSV with the columns Power Meter CSV,
+Multimeter CSV and optionally Output CSV. The pairs are combined in parallel
+on a process pool (one process per core by default), and a summary with the
+rows matched and dropped of every pair is written next to the outputs.
+
+Examples:
+    python Combine_AC_DC_Batch.py campaign_folder
+    python Combine_AC_DC_Batch.py --manifest pairs.csv --workers 4
+    python Combine_AC_DC_Batch.py campaign_folder --exact
+"""
+import argparse
+import csv
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import Combine_AC_DC
+
+summary_header = ['Name', 'Power Meter CSV', 'Multimeter CSV', 'Output CSV', 'Rows Matched', 'Rows Dropped', 'Seconds', 'Error']
+
+
+def find_pairs(folder, pm_suffix='_PM.csv', dmm_suffix='_DMM.csv', output_folder=None):
+    """
+    Return (name, pm_csv, dmm_csv, output_csv) for every name that has both a power meter and a multimeter CSV in folder.
+    Files without a partner are reported and skipped.
+    """
+    output_folder = output_folder or folder
+    files = os.listdir(folder)
+    pm_names = {f[:-len(pm_suffix)] for f in files if f.endswith(pm_suffix)}
+    dmm_names = {f[:-len(dmm_suffix)] for f in files if f.endswith(dmm_suffix)}
+    for name in sorted(pm_names ^ dmm_names):
+        print(f"Skipping {name}: no {'multimeter' if name in pm_names else 'power meter'} CSV")
+    return [(name,
+             os.path.join(folder, name + pm_suffix),
+             os.path.join(folder, name + dmm_suffix),
+             os.path.join(output_folder, f'{name}_combined.csv'))
+            for name in sorted(pm_names & dmm_names)]
+
+
+def read_manifest(manifest, output_folder=None):
+    """
+    Return (name, pm_csv, dmm_csv, output_csv) for every row of a manifest CSV.
+    Relative paths are relative to the manifest. Without an Output CSV column the
+    output is named after the multimeter CSV.
+    """
+    base = os.path.dirname(os.path.abspath(manifest))
+    pairs = []
+    with open(manifest, 'r', newline='') as file:
+        for row in csv.DictReader(file):
+            pm_csv = os.path.join(base, row['Power Meter CSV'].strip())
+            dmm_csv = os.path.join(base, row['Multimeter CSV'].strip())
+            name = os.path.splitext(os.path.basename(dmm_csv))[0]
+            output_csv = (row.get('Output CSV') or '').strip()
+            if output_csv:
+                output_csv = os.path.join(output_folder or base, output_csv)
+            else:
+                output_csv = os.path.join(output_folder or os.path.dirname(dmm_csv), f'{name}_combined.csv')
+            pairs.append((name, pm_csv, dmm_csv, output_csv))
+    return pairs
+
+
+def combine_pair(pair, tolerance=Combine_AC_DC.tolerance, interpolate=Combine_AC_DC.interpolate):
+    """
+    Combine one pair (runs in a worker process). Returns its summary row; an error is recorded instead of raised.
+    """
+    name, pm_csv, dmm_csv, output_csv = pair
+    started = time.perf_counter()
+    matched = dropped = ''
+    error = ''
+    try:
+        if tolerance is None:
+            matched, dropped = Combine_AC_DC.combine(pm_csv, dmm_csv, output_csv)
+        else:
+            matched, dropped = Combine_AC_DC.combine_asof(pm_csv, dmm_csv, output_csv, tolerance, interpolate)
+    except Exception as e:
+        error = f'{type(e).__name__}: {e}'
+    return [name, pm_csv, dmm_csv, output_csv, matched, dropped, f'{time.perf_counter() - started:.2f}', error]
+
+
+def combine_all(pairs, tolerance=Combine_AC_DC.tolerance, interpolate=Combine_AC_DC.interpolate, workers=None):
+    """
+    Combine every pair on a process pool. Returns the summary rows in the order of pairs.
+    """
+    rows = {}
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(combine_pair, pair, tolerance, interpolate): i for i, pair in enumerate(pairs)}
+        for future in as_completed(futures):
+            row = future.result()
+            rows[futures[future]] = row
+            if row[-1]:
+                print(f'{row[0]}: failed, {row[-1]}')
+            else:
+                print(f'{row[0]}: {row[4]} rows matched, {row[5]} dropped ({row[6]} s)')
+    return [rows[i] for i in range(len(pairs))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Combine every Power Meter / Multimeter CSV pair of a test campaign.')
+    parser.add_argument('folder', nargs='?', help='folder with <name>_PM.csv and <name>_DMM.csv files')
+    parser.add_argument('--manifest', help='CSV with Power Meter CSV, Multimeter CSV and optional Output CSV columns')
+    parser.add_argument('--pm-suffix', default='_PM.csv', help='file name ending of the power meter CSVs (default _PM.csv)')
+    parser.add_argument('--dmm-suffix', default='_DMM.csv', help='file name ending of the multimeter CSVs (default _DMM.csv)')
+    parser.add_argument('--output-folder', help='where to write the combined CSVs (default next to the inputs)')
+    parser.add_argument('--summary', help='summary CSV (default combine_summary_<timestamp>.csv in the output folder)')
+    parser.add_argument('--tolerance', type=float, default=Combine_AC_DC.tolerance,
+                        help=f'nearest-time match tolerance in seconds (default {Combine_AC_DC.tolerance})')
+    parser.add_argument('--exact', action='store_true', help='old exact HH:MM:SS match instead of the nearest-time join')
+    parser.add_argument('--interpolate', action='store_true', default=Combine_AC_DC.interpolate,
+                        help='interpolate the power meter values to the multimeter time')
+    parser.add_argument('--workers', type=int, help='number of processes (default one per core)')
+    args = parser.parse_args()
+
+    if (args.folder is None) == (args.manifest is None):
+        parser.error('give either a folder or --manifest')
+    if args.output_folder:
+        os.makedirs(args.output_folder, exist_ok=True)
+
+    if args.manifest:
+        pairs = read_manifest(args.manifest, args.output_folder)
+    else:
+        pairs = find_pairs(args.folder, args.pm_suffix, args.dmm_suffix, args.output_folder)
+    if not pairs:
+        print('Error: no Power Meter / Multimeter CSV pairs found.')
+        return 1
+
+    tolerance = None if args.exact else args.tolerance
+    print(f'Combining {len(pairs)} pairs')
+    started = time.perf_counter()
+    rows = combine_all(pairs, tolerance, args.interpolate, args.workers)
+
+    summary_folder = args.output_folder or args.folder or os.path.dirname(os.path.abspath(args.manifest))
+    summary = args.summary or os.path.join(summary_folder, f"combine_summary_{time.strftime('%m%d%Y-%H%M%S')}.csv")
+    with open(summary, 'w', newline='') as file:
+        csvwriter = csv.writer(file)
+        csvwriter.writerow(summary_header)
+        csvwriter.writerows(rows)
+
+    failed = sum(1 for row in rows if row[-1])
+    print('')
+    print(f'{len(rows) - failed} of {len(rows)} pairs combined in {time.perf_counter() - started:.1f} s')
+    print(f'Summary written to {summary}')
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
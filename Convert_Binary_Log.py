@@ -0,0 +1,30 @@
+import binary_log
+
+print('Enter name of the binary log (without .actlog extension):')
+log_in = input().strip()  # Get user input and remove any leading/trailing whitespace
+
+# Validate input
+if not log_in:
+    print("Error: Binary log name cannot be empty.")
+    exit()
+log_filename = f'{log_in}.actlog'
+
+print('Enter a name for the output CSV (without .csv extension):')
+output_filename_in = input().strip()
+
+# Validate input
+if not output_filename_in:
+    print("Error: Output file CSV name cannot be empty.")
+    exit()
+output_filename = f'{output_filename_in}.csv'
+
+print('Keep milliseconds in the Time column? (y/n):')
+milliseconds = input().strip().lower() == 'y'
+
+rows = binary_log.to_csv(log_filename, output_filename, milliseconds)
+
+print('')
+print(f'{rows} rows written to {output_filename}')
+print('')
+print('Press Enter to close')
+input()
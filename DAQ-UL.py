@@ -1,9 +1,19 @@
 import pyvisa
+import simulated_instruments
+import scpi_timing
+import resource_cache
 import time
-import csv
+import daq973a
+import batched_writer
 
 # Resource manager setup
-rm = pyvisa.ResourceManager()
+# Simulate runs the script against simulated_instruments instead of the bench (no instruments needed)
+simulate = False
+rm = simulated_instruments.ResourceManager() if simulate else pyvisa.ResourceManager()
+# Profile SCPI times every instrument command and prints a per-command summary when the script ends
+profile_scpi = False
+if profile_scpi:
+    rm = scpi_timing.instrument(rm, export_path='scpi_timing.json')
 
 # CSV file setup
 #channels = ['101', '102', '103', '104', '105', '111','112','113','114', '115', '116', '117', '118', '119', '120']  # active channels in DAQ
@@ -14,33 +24,40 @@ name = ['H1','L8','Rema','GD L10','T1','H2','Interior Top','CT OW','Chamber In',
 #header = ['Date', 'Time'] + [f'Channel {i}' for i in channels] + ['Avg Temp (C)', 'Avg Temp (F)']
 header = ['Date', 'Time'] + name + ['Avg Temp (C)', 'Avg Temp (F)'] #UL Test
 
+# Scan mode reads every channel with one READ? per sweep instead of one MEAS:TEMP? per channel
+scan_mode = True
+# Binary mode transfers each sweep as a float64 block (FORM:DATA REAL,64) instead of ASCII text (scan mode only)
+binary_mode = False
+
 try:
     # Open the CSV file for writing
-    with open(filename, 'w', newline='') as file:
-        csvwriter = csv.writer(file)
+    with open(filename, 'w', newline='') as file, batched_writer.BatchedWriter(file) as csvwriter:
 
         # Write the header
         csvwriter.writerow(header)
 
-        # List all connected VISA resources
-        resources = rm.list_resources()
-        print("Available resources:", resources)
+        # List all connected VISA resources (slow on a full bench, the DAQ is found through the resource cache)
+        #print("Available resources:", rm.list_resources())
 
         # DAQ973A USB resource string
         daq_resource_string = 'USB0::10893::34305::MY59007195::0::INSTR'
 
-        # Connect to the DAQ973A
-        daq = rm.open_resource(daq_resource_string)
+        # Connect to the DAQ973A at its last known address, the bench is only scanned if it moved
+        discovery = resource_cache.Discovery(rm)
+        daq = discovery.open(daq_resource_string)
         daq.timeout = 10000  # Set timeout to 10 seconds
 
-        # Print the IDN (Identification) string to verify connection
-        print("Connected to:", daq.query('*IDN?').strip())
-
         # Configure channels for thermocouple temperature measurement in Fahrenheit
+        # Scan readings come back in the configured unit, so keep Celsius to match the CSV columns
+        # The driver builds the setup and read commands once and sends the setup in one write
         thermocouple_type = 'J'
-        for channel in channels:
-            daq.write(f'CONF:TEMP TC,{thermocouple_type},(@{channel})')
-            daq.write(f'UNIT:TEMP F,(@{channel})')  # Set unit to Fahrenheit
+        driver = daq973a.DAQ973A(daq, channels, thermocouple_type, unit='C' if scan_mode else 'F', binary=binary_mode,
+                                 allowed=['scan'] if scan_mode else [], idn=discovery.idns[daq_resource_string])
+
+        # Print the IDN (Identification) string to verify connection
+        print("Connected to:", driver.idn)
+        print(f"Reading with the {driver.strategy} strategy")
+        driver.configure()
 
         # Perform multiple readings
         # Perform multiple readings
@@ -51,20 +68,22 @@ try:
             
             timestamp = time.strftime('%Y-%m-%d %H:%M:%S')
             print(f"\nReading {i + 1} at {timestamp}:")
-            daq.write('INIT')
-            time.sleep(0.5)
+            if driver.strategy == 'single':
+                daq.write('INIT')
+                time.sleep(0.5)
 
             date1 = time.strftime('%m/%d/%Y')
             time1 = time.strftime('%H:%M:%S')
             csv_out = [date1, time1]
 
-            for j, channel in enumerate(channels):
-                measurement = daq.query(f'MEAS:TEMP? TC,{thermocouple_type},(@{channel})')
-                measurement_value_c = float(measurement)
+            # One READ? returns the whole sweep in scan mode
+            sweep = driver.read()
+
+            for j, measurement_value_c in enumerate(sweep):
                 measurement_value_f = float((measurement_value_c * 1.8) + 32)
                 #print(f'Channel {channel}: {measurement_value_f:.6f} °F')
                 print(f'{name[j]}: {measurement_value_c:.6f} °C')
-                csv_out.append(f'{measurement_value_c:.6f}')
+                csv_out.append(measurement_value_c)
 
                 # Accumulate the sum for averaging
                 sum_measurements[j] += measurement_value_c
@@ -77,8 +96,8 @@ try:
             #print(f'Average Temp: {temp_average_c:.6f} °C')
             #print(f'Average Temp: {temp_average_f:.6f} °F')
 
-            csv_out.append(f'{temp_average_c:.6f}')
-            csv_out.append(f'{temp_average_f:.6f}')
+            csv_out.append(temp_average_c)
+            csv_out.append(temp_average_f)
                 
             # Write the measurements to the CSV file
             csvwriter.writerow(csv_out)
@@ -1,14 +1,26 @@
 import pyvisa
+import simulated_instruments
+import scpi_timing
+import resource_cache
 import time
-import csv
 import threading
+import daq973a
+import batched_writer
+import adaptive_sampling
+import running_stats
 
 print('DAQ Datalogger: type "stop" to end the datalogging at anytime')
 print('')
 print('')
 print('')
 # Resource manager setup
-rm = pyvisa.ResourceManager()
+# Simulate runs the script against simulated_instruments instead of the bench (no instruments needed)
+simulate = False
+rm = simulated_instruments.ResourceManager() if simulate else pyvisa.ResourceManager()
+# Profile SCPI times every instrument command and prints a per-command summary when the script ends
+profile_scpi = False
+if profile_scpi:
+    rm = scpi_timing.instrument(rm, export_path='scpi_timing.json')
 
 # CSV file setup
 # channels = ['101', '102', '103', '104', '105', '111','112','113','114', '115', '116', '117', '118', '119', '120']  # active channels in DAQ
@@ -25,6 +37,26 @@ name = ['HS2', 'T3', 'L10', 'Output Fuse', 'L11', 'J23','Solder Side','HS1','Neg
 #header = ['Date', 'Time'] + [f'Channel {i}' for i in channels] + ['Avg Temp (C)', 'Avg Temp (F)']
 header = ['Date', 'Time'] + name + ['Avg Temp (C)', 'Avg Temp (F)'] #UL Test
 
+# Scan mode reads every channel with one READ? per sweep instead of one MEAS:TEMP? per channel
+scan_mode = True
+# Binary mode transfers each sweep as a float64 block (FORM:DATA REAL,64) instead of ASCII text (scan mode only)
+binary_mode = False
+
+# Adaptive mode sweeps every min_interval seconds while any channel changes faster than rate_threshold °C/min
+# (or steps by more than deviation_threshold °C) and backs off to one sweep every max_interval seconds once
+# everything is stable. The seconds since the previous sweep are logged in an Interval (s) column
+adaptive_mode = False
+min_interval = 0.5
+max_interval = 30.0
+rate_threshold = 0.5  # °C/min
+deviation_threshold = 1.0  # °C
+if adaptive_mode:
+    header += ['Interval (s)']
+
+# Running min/max/mean/std and peak time of every channel, and the rise over ambient_channel
+# (a name from the name list, None for no rise), printed and written to <name>_summary.csv at the end
+ambient_channel = None
+
 ####################################################################################
 #filename = f'daq_measurements_{timestamp}.csv'
 print('Enter output file name (without .csv extension):')
@@ -34,6 +66,7 @@ if not name_input:
     print("Error: Power Meter CSV name cannot be empty.")
     exit()
 filename = f'{name_input}.csv'
+summary_filename = f'{name_input}_summary.csv'
 ###################################################################################
 
 stop_logging = False
@@ -53,39 +86,42 @@ input_thread.start()
 
 try:
     # Open the CSV file for writing
-    with open(filename, 'w', newline='') as file:
-        csvwriter = csv.writer(file)
+    with open(filename, 'w', newline='') as file, batched_writer.BatchedWriter(file) as csvwriter:
 
         # Write the header
         csvwriter.writerow(header)
 
-        # List all connected VISA resources
-        resources = rm.list_resources()
-        print("Available resources:", resources)
+        # List all connected VISA resources (slow on a full bench, the DAQ is found through the resource cache)
+        #print("Available resources:", rm.list_resources())
 
         # DAQ973A USB resource string
         daq_resource_string = 'USB0::10893::34305::MY59007195::0::INSTR'
 
-        # Connect to the DAQ973A
-        daq = rm.open_resource(daq_resource_string)
+        # Connect to the DAQ973A at its last known address, the bench is only scanned if it moved
+        discovery = resource_cache.Discovery(rm)
+        daq = discovery.open(daq_resource_string)
         daq.timeout = 10000  # Set timeout to 10 seconds
 
-        # Print the IDN (Identification) string to verify connection
-        print("Connected to:", daq.query('*IDN?').strip())
-
-        # Configure channels for thermocouple temperature measurement in Fahrenheit
+        # Configure channels for thermocouple temperature measurement in Celsius
+        # The driver builds the setup and read commands once and sends the setup in one write
         thermocouple_type = 'J'
-        for channel in channels:
-            daq.write(f'CONF:TEMP TC,{thermocouple_type},(@{channel})')
-            daq.write(f'UNIT:TEMP C,(@{channel})')  # Set unit to Celsius
+        driver = daq973a.DAQ973A(daq, channels, thermocouple_type, binary=binary_mode, allowed=['scan'] if scan_mode else [],
+                                 idn=discovery.idns[daq_resource_string])
 
-        daq.write('INIT')
-        time.sleep(0.5)
+        # Print the IDN (Identification) string to verify connection
+        print("Connected to:", driver.idn)
+        print(f"Reading with the {driver.strategy} strategy")
+        driver.configure()
+        if adaptive_mode:
+            scheduler = adaptive_sampling.Scheduler(min_interval, max_interval, rate_threshold, deviation_threshold)
         
 
         # Perform multiple readings
         # Perform multiple readings
         reading_count = 0
+        # Statistics of every channel, updated every sweep without keeping the readings
+        stats = running_stats.RunningStats(name, ambient_channel)
+        start = time.monotonic()
         while not stop_logging:
             timestamp = time.strftime('%Y-%m-%d %H:%M:%S')
             print(f"\nReading {reading_count + 1} at {timestamp}:")
@@ -96,13 +132,15 @@ try:
             time1 = time.strftime('%H:%M:%S')
             csv_out = [date1, time1]
 
-            for j, channel in enumerate(channels):
-                measurement = daq.query(f'MEAS:TEMP? TC,{thermocouple_type},(@{channel})')
-                measurement_value_c = float(measurement)
+            # One READ? returns the whole sweep in scan mode
+            sweep = driver.read()
+            stats.update(time.monotonic() - start, sweep)
+
+            for j, measurement_value_c in enumerate(sweep):
                 #measurement_value_f = float((measurement_value_c * 1.8) + 32)
                 #print(f'Channel {channel}: {measurement_value_f:.6f} °F')
                 print(f'{name[j]}: {measurement_value_c:.6f} °C')
-                csv_out.append(f'{measurement_value_c:.6f}')
+                csv_out.append(measurement_value_c)
 
                 # Accumulate the sum for averaging
                 sum_measurements[j] += measurement_value_c
@@ -115,12 +153,20 @@ try:
             print(f'Average Temp: {temp_average_c:.6f} °C')
             print(f'Average Temp: {temp_average_f:.6f} °F')
 
-            csv_out.append(f'{temp_average_c:.6f}')
-            csv_out.append(f'{temp_average_f:.6f}')
+            csv_out.append(temp_average_c)
+            csv_out.append(temp_average_f)
+
+            if adaptive_mode:
+                scheduler.update(sweep)
+                print(f'Interval: {scheduler.effective:.1f} s, next sweep in {scheduler.interval:.1f} s')
+                csv_out.append(scheduler.effective)
                 
             # Write the measurements to the CSV file
             csvwriter.writerow(csv_out)
-            time.sleep(2.5)  # Wait 2.5 seconds between readings
+            if adaptive_mode:
+                scheduler.wait(lambda: stop_logging)
+            else:
+                time.sleep(2.5)  # Wait 2.5 seconds between readings
             reading_count += 1 #increase counter
 
 except pyvisa.VisaIOError as e:
@@ -129,6 +175,9 @@ except Exception as e:
     print(f"An error occurred: {e}")
 
 finally:
+    if 'stats' in locals():
+        stats.report(summary_filename)
+
     # Close the connection
     if 'daq' in locals():
         daq.close()
@@ -1,19 +1,48 @@
 import pyvisa
+import simulated_instruments
+import scpi_timing
+import resource_cache
 import time
-import csv
 import threading
-import matplotlib.pyplot as plt
+import daq973a
+import timebase
+import ring_buffer
+import batched_writer
+import plot_render
 
 print('DAQ Datalogger: type "stop" to end the datalogging at anytime')
 print('')
 
 # Resource manager setup
-rm = pyvisa.ResourceManager()
+# Simulate runs the script against simulated_instruments instead of the bench (no instruments needed)
+simulate = False
+rm = simulated_instruments.ResourceManager() if simulate else pyvisa.ResourceManager()
+# Profile SCPI times every instrument command and prints a per-command summary when the script ends
+profile_scpi = False
+if profile_scpi:
+    rm = scpi_timing.instrument(rm, export_path='scpi_timing.json')
 
 channels = ['105', '102', '119', '112', '111', '113','114','104','115', '103', '117', '101']
 name = ['HS2', 'T3', 'L10', 'Output Fuse', 'L11', 'J23','Solder Side','HS1','Negative Busbar', 'L2','Top', 'Exhaust Fan']
 header = ['Date', 'Time'] + name + ['Avg Temp (C)', 'Avg Temp (F)']
 
+# Scan mode reads every channel with one READ? per sweep instead of one MEAS:TEMP? per channel
+scan_mode = True
+# Binary mode transfers each sweep as a float64 block (FORM:DATA REAL,64) instead of ASCII text (scan mode only)
+binary_mode = False
+# Instrument time uses the DAQ973A's own reading time stamps (FORM:READ:TIME) instead of the PC clock (scan mode only)
+instrument_time = False
+# Seconds between sweeps, and the hours at the end of the run the plot keeps at full resolution
+# (everything before is min/max decimated)
+sweep_interval = 0.5
+full_resolution_hours = 2
+# Headless mode never loads matplotlib or keeps a history while logging (unattended runs),
+# the plot is rendered from the CSV after the run (or later with Render_Plot.py)
+headless = False
+
+if not headless:
+    import matplotlib.pyplot as plt
+
 print('Enter output file name (without .csv extension):')
 name_input = input().strip()
 if not name_input:
@@ -36,61 +65,61 @@ input_thread = threading.Thread(target=check_for_stop)
 input_thread.daemon = True
 input_thread.start()
 
-# Lists to store timestamps and temperature data for each channel
-timestamps = []
-channel_name_temps = {name[i]: [] for i in range(len(name))}
-avg_temps_c = []
+if not headless:
+    # Fixed-memory store of timestamps and temperature data for each channel:
+    # the last full_resolution_hours at full resolution and the rest of the run min/max decimated
+    history = ring_buffer.DecimatedHistory(len(name), capacity=int(full_resolution_hours * 3600 / sweep_interval))
 
 try:
     # Open the CSV file for writing
-    with open(csv_filename, 'w', newline='') as file:
-        csvwriter = csv.writer(file)
+    with open(csv_filename, 'w', newline='') as file, batched_writer.BatchedWriter(file) as csvwriter:
         csvwriter.writerow(header)
 
-        resources = rm.list_resources()
-        print("Available resources:", resources)
+        #print("Available resources:", rm.list_resources())  # slow on a full bench, the DAQ is found through the resource cache
 
         daq_resource_string = 'USB0::10893::34305::MY59007195::0::INSTR'
-        daq = rm.open_resource(daq_resource_string)
+        # Opened at its last known address, the bench is only scanned if it moved
+        discovery = resource_cache.Discovery(rm)
+        daq = discovery.open(daq_resource_string)
         daq.timeout = 10000
-        print("Connected to:", daq.query('*IDN?').strip())
 
+        # The driver builds the setup and read commands once and sends the setup in one write
         thermocouple_type = 'J'
-        for channel in channels:
-            daq.write(f'CONF:TEMP TC,{thermocouple_type},(@{channel})')
-            daq.write(f'UNIT:TEMP C,(@{channel})')
+        driver = daq973a.DAQ973A(daq, channels, thermocouple_type, binary=binary_mode, timestamps=instrument_time,
+                                 allowed=['scan'] if scan_mode else [], idn=discovery.idns[daq_resource_string])
+        print("Connected to:", driver.idn)
+        print(f"Reading with the {driver.strategy} strategy")
+        driver.configure()
 
-        daq.write('INIT')
-        time.sleep(0.5)
+        # Every sample time comes from one monotonic clock, read once against the wall clock here
+        clock = timebase.Clock()
+        instrument_start = None
 
-        time_start_h = int(time.strftime('%H'))
-        time_start_m = int(time.strftime('%M'))
-        time_start_s = int(time.strftime('%S'))
-        time_start = (time_start_h * 60) + time_start_m + (time_start_s / 60)
-        
         reading_count = 0
         while not stop_logging:
-            timestamp = time.strftime('%Y-%m-%d %H:%M:%S')
-            print(f"\nReading {reading_count + 1} at {timestamp}:")
             sum_measurements = [0.0] * len(channels)
-            
-            date1 = time.strftime('%m/%d/%Y')
-            time1 = time.strftime('%H:%M:%S')
-            current_h = int(time.strftime('%H'))
-            current_m = int(time.strftime('%M'))
-            current_s = int(time.strftime('%S'))
-            time_current = (current_h * 60) + current_m + (current_s / 60)
-            delta_time = time_current - time_start
+
+            if driver.timestamps:
+                # Time the sweep with the DAQ's own time stamp of its first reading
+                sweep, now = driver.read_timed()
+                if instrument_start is None:
+                    instrument_start = now
+                elapsed = (now - instrument_start).total_seconds()
+            else:
+                elapsed, now = clock.now()
+                sweep = driver.read()
+
+            print(f"\nReading {reading_count + 1} at {now:%Y-%m-%d %H:%M:%S}:")
+            date1 = f'{now:%m/%d/%Y}'
+            time1 = f'{now:%H:%M:%S}'
+            delta_time = elapsed / 60  # minutes since start
             csv_out = [date1, time1]
 
-            for j, channel in enumerate(channels):
-                measurement = daq.query(f'MEAS:TEMP? TC,{thermocouple_type},(@{channel})')
-                measurement_value_c = float(measurement)
+            for j, measurement_value_c in enumerate(sweep):
                 print(f'{name[j]}: {measurement_value_c:.6f} °C')
-                csv_out.append(f'{measurement_value_c:.6f}')
+                csv_out.append(measurement_value_c)
 
                 sum_measurements[j] += measurement_value_c
-                channel_name_temps[name[j]].append(measurement_value_c)
 
             total_temp = sum(sum_measurements)
             temp_average_c = total_temp / len(sum_measurements)
@@ -99,15 +128,15 @@ try:
             print(f'Average Temp: {temp_average_c:.6f} °C')
             print(f'Average Temp: {temp_average_f:.6f} °F')
 
-            csv_out.append(f'{temp_average_c:.6f}')
-            csv_out.append(f'{temp_average_f:.6f}')
+            csv_out.append(temp_average_c)
+            csv_out.append(temp_average_f)
                 
             csvwriter.writerow(csv_out)
 
-            timestamps.append(delta_time)
-            avg_temps_c.append(temp_average_c)
+            if not headless:
+                history.append(delta_time, sweep)
 
-            time.sleep(0.5)
+            time.sleep(sweep_interval)
             reading_count += 1
 
 except pyvisa.VisaIOError as e:
@@ -122,11 +151,17 @@ finally:
         print("")
         print("Connection closed.")
 
-    if timestamps and any(channel_name_temps.values()):
+    if headless:
+        if plot_render.render(csv_filename, png_filename):
+            print(f'Plot saved as {png_filename}')
+        else:
+            print("No data available for plotting.")
+    elif len(history):
         plt.figure(figsize=(12, 8))
 
-        for channel, temps in channel_name_temps.items():
-            plt.plot(timestamps, temps, marker='o', label=f'Channel {channel}')
+        timestamps, temps = history.data()
+        for j, channel in enumerate(name):
+            plt.plot(timestamps, temps[:, j], marker='o', label=f'Channel {channel}')
         
         plt.ylim(20, 100)
         plt.xlim(0, max(timestamps))
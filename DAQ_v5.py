@@ -1,19 +1,84 @@
 import pyvisa
+import simulated_instruments
+import scpi_timing
+import resource_cache
 import time
-import csv
 import threading
-import matplotlib.pyplot as plt
+import queue
+import daq973a
+import timebase
+import live_plot
+import ring_buffer
+import batched_writer
+import binary_log
+import plot_render
+import adaptive_sampling
+import running_stats
+import steady_state
 
 print('DAQ Datalogger: type "stop" to end the datalogging at anytime')
 print('')
 
 # Resource manager setup
-rm = pyvisa.ResourceManager()
+# Simulate runs the script against simulated_instruments instead of the bench (no instruments needed)
+simulate = False
+rm = simulated_instruments.ResourceManager() if simulate else pyvisa.ResourceManager()
+# Profile SCPI times every instrument command and prints a per-command summary when the script ends
+profile_scpi = False
+if profile_scpi:
+    rm = scpi_timing.instrument(rm, export_path='scpi_timing.json')
 
 channels = ['105', '102', '119', '112', '111', '113','114','104','115', '103', '117', '101']
 name = ['HS2', 'T3', 'L10', 'Output Fuse', 'L11', 'J23','Solder Side','HS1','Negative Busbar', 'L2','Top', 'Exhaust Fan']
 header = ['Date', 'Time'] + name + ['Avg Temp (C)', 'Avg Temp (F)']
 
+# Scan mode reads every channel with one READ? per sweep instead of one MEAS:TEMP? per channel
+scan_mode = True
+# Binary mode transfers each sweep as a float64 block (FORM:DATA REAL,64) instead of ASCII text (scan mode only)
+binary_mode = False
+# Instrument time uses the DAQ973A's own reading time stamps (FORM:READ:TIME) instead of the PC clock (scan mode only)
+instrument_time = False
+
+# Seconds between sweeps, and the hours at the end of the run the plot keeps at full resolution
+# (everything before is min/max decimated)
+sweep_interval = 0.5
+full_resolution_hours = 2
+
+# Adaptive mode sweeps every min_interval seconds while any channel changes faster than rate_threshold °C/min
+# (or steps by more than deviation_threshold °C) and backs off to one sweep every max_interval seconds once
+# everything is stable. The seconds since the previous sweep are logged in an Interval (s) column
+adaptive_mode = False
+min_interval = 0.5
+max_interval = 30.0
+rate_threshold = 0.5  # °C/min
+deviation_threshold = 1.0  # °C
+if adaptive_mode:
+    header += ['Interval (s)']
+
+# Running min/max/mean/std and peak time of every channel, and the rise over ambient_channel
+# (a name from the name list, None for no rise), printed and written to <name>_summary.csv at the end
+ambient_channel = None
+
+# Steady state is reached when every channel in steady_channels changes less than steady_rate °C/min
+# (slope over the last steady_window seconds) for steady_hold seconds in a row.
+# With stop_at_steady_state the run then ends by itself and the plot and summary are written as after "stop"
+detect_steady_state = False
+stop_at_steady_state = False
+steady_channels = name  # names from the name list to watch
+steady_rate = 0.1  # °C/min
+steady_window = 600.0  # seconds
+steady_hold = 300.0  # seconds
+
+# Also write every reading to a compact binary log (<name>.actlog), convert it with Convert_Binary_Log.py
+write_binary_log = False
+
+# Headless mode never loads matplotlib or keeps a history while logging (unattended runs),
+# the plot is rendered from the log after the run (or later with Render_Plot.py)
+headless = False
+
+if not headless:
+    import matplotlib.pyplot as plt
+
 print('Enter output file name (without .csv extension):')
 name_input = input().strip()
 if not name_input:
@@ -21,6 +86,8 @@ if not name_input:
     exit()
 csv_filename = f'{name_input}.csv'
 png_filename = f'{name_input}.png'
+log_filename = f'{name_input}.actlog'
+summary_filename = f'{name_input}_summary.csv'
 
 stop_logging = False
 
@@ -36,132 +103,191 @@ input_thread = threading.Thread(target=check_for_stop)
 input_thread.daemon = True
 input_thread.start()
 
-# Lists to store timestamps and temperature data for each channel
-timestamps = []
-channel_name_temps = {name[i]: [] for i in range(len(name))}
-avg_temps_c = []
-
-# Initialize the plot
-plt.ion()  # Turn on interactive mode
-fig, ax = plt.subplots(figsize=(12, 8))
-
-ax.set_title('Temperature vs Time', fontsize=26, pad=20)  # Add padding to create space below the title
-
-# Add subtitle (file name) below the title with smaller font and grey colorstop
-
-fig.text(0.43, 0.92, f'File: {csv_filename}', ha='center', fontsize=14, color='grey')
-
-lines = {channel: ax.plot([], [], label=f'Channel {channel}')[0] for channel in name}
-
-# Set initial plot settings
-ax.set_ylim(20, 100)
-ax.set_xlim(0, 10)  # Initial xlim, will be updated dynamically
-ax.set_xticks(range(0, 100, 5))
-ax.set_yticks(range(20, 101, 5))
-ax.minorticks_on()
-ax.grid(which='both', axis='y')
-ax.grid(which='minor', axis='y', linestyle=':', linewidth=0.5)
-ax.set_xlabel('Time (min)', fontsize=20)
-ax.set_ylabel('Temperature (°C)', fontsize=20)
-# ax.set_title('Temperature vs Time', fontsize=26)
-ax.legend(loc='upper right', bbox_to_anchor=(1.27, 1), borderaxespad=0.)
-plt.xticks(rotation=45, ha='right')
-plt.tight_layout()
-plt.subplots_adjust(right=0.8)
-
-try:
-    # Open the CSV file for writing
-    with open(csv_filename, 'w', newline='') as file:
-        csvwriter = csv.writer(file)
-        csvwriter.writerow(header)
-
-        resources = rm.list_resources()
-        print("Available resources:", resources)
-
-        daq_resource_string = 'USB0::10893::34305::MY59007195::0::INSTR'
-        daq = rm.open_resource(daq_resource_string)
-        daq.timeout = 10000
-        print("Connected to:", daq.query('*IDN?').strip())
-
-        thermocouple_type = 'J'
-        for channel in channels:
-            daq.write(f'CONF:TEMP TC,{thermocouple_type},(@{channel})')
-            daq.write(f'UNIT:TEMP C,(@{channel})')
-
-        daq.write('INIT')
-        time.sleep(0.5)
-
-        time_start_h = int(time.strftime('%H'))
-        time_start_m = int(time.strftime('%M'))
-        time_start_s = int(time.strftime('%S'))
-        time_start = (time_start_h * 60) + time_start_m + (time_start_s / 60)
-        
-        reading_count = 0
-        while not stop_logging:
-            timestamp = time.strftime('%Y-%m-%d %H:%M:%S')
-            print(f"\nReading {reading_count + 1} at {timestamp}:")
-            sum_measurements = [0.0] * len(channels)
-            
-            date1 = time.strftime('%m/%d/%Y')
-            time1 = time.strftime('%H:%M:%S')
-            current_h = int(time.strftime('%H'))
-            current_m = int(time.strftime('%M'))
-            current_s = int(time.strftime('%S'))
-            time_current = (current_h * 60) + current_m + (current_s / 60)
-            delta_time = time_current - time_start
-            csv_out = [date1, time1]
-
-            for j, channel in enumerate(channels):
-                measurement = daq.query(f'MEAS:TEMP? TC,{thermocouple_type},(@{channel})')
-                measurement_value_c = float(measurement)
-                print(f'{name[j]}: {measurement_value_c:.6f} °C')
-                csv_out.append(f'{measurement_value_c:.6f}')
-
-                sum_measurements[j] += measurement_value_c
-                channel_name_temps[name[j]].append(measurement_value_c)
-
-            total_temp = sum(sum_measurements)
-            temp_average_c = total_temp / len(sum_measurements)
-            temp_average_f = (temp_average_c * 1.8) + 32
-
-            print(f'Average Temp: {temp_average_c:.6f} °C')
-            print(f'Average Temp: {temp_average_f:.6f} °F')
-
-            csv_out.append(f'{temp_average_c:.6f}')
-            csv_out.append(f'{temp_average_f:.6f}')
-                
-            csvwriter.writerow(csv_out)
-
-            timestamps.append(delta_time)
-            avg_temps_c.append(temp_average_c)
-
-            # Update plot
-            for channel in name:
-                lines[channel].set_data(timestamps, channel_name_temps[channel])
-            
-            # Update xlim to accommodate new data
-            ax.set_xlim(0, max(timestamps) if timestamps else 10)
-            ax.relim()
-            ax.autoscale_view()
-            
-            plt.draw()
-            plt.pause(0.1)  # Pause to update the plot
-
-            time.sleep(0.5)
-            reading_count += 1
-
-except pyvisa.VisaIOError as e:
-    print(f"VISA IO Error: {e}")
-except Exception as e:
-    print(f"An error occurred: {e}")
-
-finally:
-    if 'daq' in locals():
-        daq.close()
-        print("Connection closed.")
+if not headless:
+    # Fixed-memory store of timestamps and temperature data for each channel:
+    # the last full_resolution_hours at full resolution and the rest of the run min/max decimated
+    fastest = min_interval if adaptive_mode else sweep_interval  # adaptive sweeps are never closer than min_interval
+    history = ring_buffer.DecimatedHistory(len(name), capacity=int(full_resolution_hours * 3600 / fastest))
+# Statistics of every channel, updated every sweep without keeping the readings
+stats = running_stats.RunningStats(name, ambient_channel)
+if detect_steady_state:
+    detector = steady_state.Detector(name, steady_channels, steady_rate, steady_window, steady_hold)
+
+# Sweeps go from the measurement thread to the plot through this queue
+sample_queue = queue.Queue()
+frame_rate = 2  # plot redraws per second
+
+# Rows are written by a background thread: flushed every flush_rows rows or flush_interval seconds,
+# and fsync'd to disk every fsync_interval seconds (None = leave it to the OS)
+flush_rows = 100
+flush_interval = 5.0
+fsync_interval = None
+
+if not headless:
+    # Initialize the plot
+    plt.ion()  # Turn on interactive mode
+    fig, ax = plt.subplots(figsize=(12, 8))
+
+    ax.set_title('Temperature vs Time', fontsize=26, pad=20)  # Add padding to create space below the title
+
+    # Add subtitle (file name) below the title with smaller font and grey colorstop
+
+    fig.text(0.43, 0.92, f'File: {csv_filename}', ha='center', fontsize=14, color='grey')
+
+    lines = {channel: ax.plot([], [], label=f'Channel {channel}')[0] for channel in name}
+
+    # Set initial plot settings
+    ax.set_ylim(20, 100)
+    ax.set_xlim(0, 10)  # Initial xlim, will be updated dynamically
+    ax.set_xticks(range(0, 100, 5))
+    ax.set_yticks(range(20, 101, 5))
+    ax.minorticks_on()
+    ax.grid(which='both', axis='y')
+    ax.grid(which='minor', axis='y', linestyle=':', linewidth=0.5)
+    ax.set_xlabel('Time (min)', fontsize=20)
+    ax.set_ylabel('Temperature (°C)', fontsize=20)
+    # ax.set_title('Temperature vs Time', fontsize=26)
+    ax.legend(loc='upper right', bbox_to_anchor=(1.27, 1), borderaxespad=0.)
+    plt.xticks(rotation=45, ha='right')
+    plt.tight_layout()
+    plt.subplots_adjust(right=0.8)
+
+def acquire():
+    """
+    Measurement loop, runs in its own thread and hands every sweep to the plot through sample_queue.
+    """
+    global stop_logging
+    try:
+        # Open the CSV file for writing
+        with open(csv_filename, 'w', newline='') as file, batched_writer.BatchedWriter(file, flush_rows, flush_interval, fsync_interval) as csvwriter:
+            csvwriter.writerow(header)
+            if write_binary_log:
+                blog = binary_log.BinaryLogWriter(log_filename, header[2:], flush_interval)
+
+            #print("Available resources:", rm.list_resources())  # slow on a full bench, the DAQ is found through the resource cache
+
+            daq_resource_string = 'USB0::10893::34305::MY59007195::0::INSTR'
+            # Opened at its last known address, the bench is only scanned if it moved
+            discovery = resource_cache.Discovery(rm)
+            daq = discovery.open(daq_resource_string)
+            daq.timeout = 10000
+
+            # The driver builds the setup and read commands once and sends the setup in one write
+            thermocouple_type = 'J'
+            driver = daq973a.DAQ973A(daq, channels, thermocouple_type, binary=binary_mode, timestamps=instrument_time,
+                                     allowed=['scan'] if scan_mode else [], idn=discovery.idns[daq_resource_string])
+            print("Connected to:", driver.idn)
+            print(f"Reading with the {driver.strategy} strategy")
+            driver.configure()
+
+            # Every sample time comes from one monotonic clock, read once against the wall clock here
+            clock = timebase.Clock()
+            instrument_start = None
+            if adaptive_mode:
+                scheduler = adaptive_sampling.Scheduler(min_interval, max_interval, rate_threshold, deviation_threshold)
+
+            reading_count = 0
+            while not stop_logging:
+                sum_measurements = [0.0] * len(channels)
+
+                if driver.timestamps:
+                    # Time the sweep with the DAQ's own time stamp of its first reading
+                    sweep, now = driver.read_timed()
+                    if instrument_start is None:
+                        instrument_start = now
+                    elapsed = (now - instrument_start).total_seconds()
+                else:
+                    elapsed, now = clock.now()
+                    sweep = driver.read()
+
+                print(f"\nReading {reading_count + 1} at {now:%Y-%m-%d %H:%M:%S}:")
+                date1 = f'{now:%m/%d/%Y}'
+                time1 = f'{now:%H:%M:%S}'
+                delta_time = elapsed / 60  # minutes since start
+                csv_out = [date1, time1]
+                stats.update(elapsed, sweep)
+
+                for j, measurement_value_c in enumerate(sweep):
+                    print(f'{name[j]}: {measurement_value_c:.6f} °C')
+                    csv_out.append(measurement_value_c)
+
+                    sum_measurements[j] += measurement_value_c
+
+                total_temp = sum(sum_measurements)
+                temp_average_c = total_temp / len(sum_measurements)
+                temp_average_f = (temp_average_c * 1.8) + 32
+
+                print(f'Average Temp: {temp_average_c:.6f} °C')
+                print(f'Average Temp: {temp_average_f:.6f} °F')
+
+                csv_out.append(temp_average_c)
+                csv_out.append(temp_average_f)
+
+                if detect_steady_state:
+                    was_steady = detector.reached_at is not None
+                    steady = detector.update(elapsed, sweep)
+                    print(detector.status())
+                    if steady and not was_steady:
+                        print(f'Steady state reached at {elapsed / 60:.1f} min')
+                        if stop_at_steady_state:
+                            stop_logging = True
+
+                if adaptive_mode:
+                    scheduler.update(sweep, elapsed)
+                    print(f'Interval: {scheduler.effective:.1f} s, next sweep in {scheduler.interval:.1f} s')
+                    csv_out.append(scheduler.effective)
+
+                csvwriter.writerow(csv_out)
+                if write_binary_log:
+                    blog.append(now, csv_out[2:])
+
+                # Hand the sweep to the plot, it is drawn on the main thread
+                if not headless:
+                    sample_queue.put((delta_time, list(sweep)))
+
+                if adaptive_mode:
+                    scheduler.wait(lambda: stop_logging)
+                else:
+                    time.sleep(sweep_interval)
+                reading_count += 1
+
+    except pyvisa.VisaIOError as e:
+        print(f"VISA IO Error: {e}")
+    except Exception as e:
+        print(f"An error occurred: {e}")
+
+    finally:
+        stop_logging = True
+        stats.report(summary_filename)
+        if detect_steady_state:
+            print(detector.status())
+        if 'blog' in locals():
+            blog.close()
+        if 'daq' in locals():
+            daq.close()
+            print("Connection closed.")
+
+
+# Run the measurements in the background and keep the main thread for the plot
+acquisition_thread = threading.Thread(target=acquire)
+acquisition_thread.start()
+
+if headless:
+    acquisition_thread.join()
+    # The binary log is much faster to read, use it when one was written
+    if plot_render.render(log_filename if write_binary_log else csv_filename, png_filename, subtitle=f'File: {csv_filename}'):
+        print(f'Plot saved as {png_filename}')
+    else:
+        print("No data available for plotting.")
+else:
+    live = live_plot.LivePlot(fig, ax, lines, history, fps=frame_rate)
+    live.run(sample_queue, lambda: not acquisition_thread.is_alive())
+    acquisition_thread.join()
 
     plt.ioff()  # Turn off interactive mode
-    if timestamps and any(channel_name_temps.values()):
+    if len(history):
+        live.finish()
+        ax.set_xlim(0, history.last_time())
         plt.savefig(png_filename, format='png', bbox_inches='tight')
         plt.show()
         print(f'Plot saved as {png_filename}')
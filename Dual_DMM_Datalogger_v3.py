@@ -1,27 +1,80 @@
 import pyvisa
+import simulated_instruments
+import scpi_timing
+import resource_cache
 import time
-import csv
 import threading
+import scpi_driver
+import dmm34465a
+import batched_writer
+import binary_log
+import power_meter
+import running_stats
+import numpy as np
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
 
 
 ################PyVisa Setup##################################################################
 # Resource manager setup
-rm = pyvisa.ResourceManager()
+# Simulate runs the script against simulated_instruments instead of the bench (no instruments needed)
+simulate = False
+rm = simulated_instruments.ResourceManager() if simulate else pyvisa.ResourceManager()
+# Profile SCPI times every instrument command and prints a per-command summary when the script ends
+profile_scpi = False
+if profile_scpi:
+    rm = scpi_timing.instrument(rm, export_path='scpi_timing.json')
 
-resources = rm.list_resources() #Lists connected devices 
-#print("Available resources:", resources) #uncomment this to check devices
+# Instruments are opened at their last known address (resource_cache), the bench is only scanned if one moved
+discovery = resource_cache.Discovery(rm)
+#print("Available resources:", rm.list_resources()) #uncomment this to check devices
 
 ##############################################################################################
 
 ####################Device Setup##############################################################################
 dmm_id1 = 'USB0::0x2A8D::0x0301::MY54507560::INSTR'  # multimeter 1 (ACT0012)
 dmm_id2 = 'USB0::0x2A8D::0x0301::MY54505907::INSTR'  # multimeter 2 (ACT0011)
+pm_id = 'USB0::0x0B21::0x0025::XXXXXXXXX::INSTR'  # power meter, set to the serial number on the bench
 
             ##CSV file setup##
 timestamp = time.strftime('%Y%m%d-%H%M%S')
 #filename = f'Dual_DMM_Datalogger_{timestamp}.csv'
 header = ['Date'] + ['Time'] + ['Voltage (V)'] + ['Current (A)'] + ['Voltage of shunt (V)'] + ['Power (kW)']
 
+# Binary mode transfers readings as float64 blocks (FORM:DATA REAL,64) instead of ASCII text
+binary_mode = False
+
+# The meters autorange like MEAS:VOLT:DC? did in every mode but buffered, where timed sampling
+# needs a fixed range, one per meter
+volt_range1 = 10  # multimeter 1, DC output voltage
+volt_range2 = 0.1  # multimeter 2, shunt voltage (5-20 mV)
+
+# Also write every reading to a compact binary log (<name>.actlog), convert it with Convert_Binary_Log.py
+write_binary_log = False
+
+# Buffered mode lets the meters sample into their reading memory at a fixed interval and drains it in chunks
+buffered_mode = False
+nplc = 0.02  # integration time in power line cycles (0.02 is the fastest setting)
+sample_interval = 0.001  # seconds between samples in buffered mode (1 kHz)
+chunk_size = 5000  # maximum readings removed from each meter per DATA:REM? call
+
+# Sync mode triggers both meters together so every power sample comes from a matched voltage/shunt pair
+sync_mode = False
+# Trigger of sync mode and of the start of buffered sampling
+trigger_source = 'BUS'  # 'BUS' sends *TRG over USB, 'EXT' waits for a shared trigger line on both Ext Trig inputs
+
+# Live efficiency reads the power meter next to the multimeters and adds its values and the efficiency
+# (DC power / total power) to every row, matched to the nearest power meter reading within pm_tolerance seconds
+live_efficiency = False
+pm_interval = 0.5  # seconds between power meter readings
+pm_tolerance = 1.0
+
+# Rows are written by a background thread: flushed every flush_rows rows or flush_interval seconds,
+# and fsync'd to disk every fsync_interval seconds (None = leave it to the OS)
+flush_rows = 100
+flush_interval = 5.0
+fsync_interval = None
+
 print('Enter output file name (without .csv extension):')
 name_input = input().strip()  # Get user input and remove any leading/trailing whitespace
 # Validate input
@@ -29,6 +82,8 @@ if not name_input:
     print("Error: Power Meter CSV name cannot be empty.")
     exit()
 filename = f'{name_input}.csv'
+log_filename = f'{name_input}.actlog'
+summary_filename = f'{name_input}_summary.csv'
 ##############################################################################################################
 
 ##############################################################
@@ -52,75 +107,196 @@ input_thread.start()
 
 try:
     # Open the CSV file for writing
-    with open(filename, 'w', newline='') as file:
-        csvwriter = csv.writer(file)
+    with open(filename, 'w', newline='') as file, batched_writer.BatchedWriter(file, flush_rows, flush_interval, fsync_interval) as csvwriter:
+
+        if live_efficiency:
+            header = header + power_meter.header + ['Efficiency']
 
         # Write the header
         csvwriter.writerow(header)
+        if write_binary_log:
+            blog = binary_log.BinaryLogWriter(log_filename, header[2:], flush_interval)
+
+        # Running min/max/mean/std and peak time of every quantity, printed and written to <name>_summary.csv at the end
+        stats = running_stats.RunningStats(header[2:])
 
         # Connect to the Keysight 34465A
-        dmm1 = rm.open_resource(dmm_id1)
+        dmm1 = discovery.open(dmm_id1)
         dmm1.timeout = 10000  # Set timeout to 10 seconds
 
-        dmm2 = rm.open_resource(dmm_id2)
+        dmm2 = discovery.open(dmm_id2)
         dmm2.timeout = 10000  # Set timeout to 10 seconds
 
+        # The drivers build each meter's setup and read commands once, for the fastest strategy both meters
+        # support out of the mode chosen above (single if they support neither)
+        allowed = ['buffered'] if buffered_mode else ['triggered'] if sync_mode else []
+        ranges = (volt_range1, volt_range2) if buffered_mode else ('AUTO', 'AUTO')
+        meters = [dmm34465a.DMM34465A(dmm, allowed, volt_range, 'DEF', nplc, sample_interval, trigger_source, binary_mode,
+                                      discovery.idns[dmm_id])
+                  for dmm, dmm_id, volt_range in ((dmm1, dmm_id1, ranges[0]), (dmm2, dmm_id2, ranges[1]))]
+        meter1, meter2 = meters
+
         # Print the IDN (Identification) string to verify connection of multimeter 1
-        print("Connected to:", dmm1.query('*IDN?').strip())
+        print("Connected to:", meter1.idn)
 
         # Print the IDN (Identification) string to verify connection of multimeter 2
-        print("Connected to:", dmm2.query('*IDN?').strip())
+        print("Connected to:", meter2.idn)
+
+        strategy = scpi_driver.use_fastest(meters, allowed)
+        print(f"Reading with the {strategy} strategy")
+
+        if live_efficiency:
+            pm = discovery.open(pm_id)
+            pm.timeout = 10000  # Set timeout to 10 seconds
+            print("Connected to:", pm.query('*IDN?').strip())
+            power_meter.configure(pm)
+            poller = power_meter.Poller(pm, pm_interval)
+            poller.start()
 
         dmm1.write('INIT')
         dmm2.write('INIT')
         time.sleep(0.5)
 
-        # Configure the multimeter for voltage measurement
-        dmm1.write('CONF:VOLT:DC 10,0.001')  # Configure for DC voltage, range 10V, resolution 1mV
-        dmm2.write('CONF:VOLT:DC 10,0.001')  # Configure for DC voltage, range 10V, resolution 1mV
+        # Configure the multimeters for voltage measurement, one write each
+        meter1.configure()
+        meter2.configure()
+
+        if strategy in ('buffered', 'triggered'):
+            # Both meters are armed and triggered together, requests go out on two threads
+            pool = ThreadPoolExecutor(max_workers=2)
 
-        # Perform multiple readings until stopped
-        reading_count = 0
-        while not stop_logging:
-            timestamp = time.strftime('%Y-%m-%d %H:%M:%S')
-            print(f"\nReading {reading_count + 1} at {timestamp}:")
+        if strategy == 'buffered':
+            # Let both meters sample into their reading memory on their own timers, started by one shared trigger
+            dmm34465a.trigger(pool, [dmm1, dmm2], trigger_source)
+            start_time = time.time()
 
-            date1 = time.strftime('%m/%d/%Y')
-            time1 = time.strftime('%H:%M:%S')
-            csv_out = [date1, time1]
+            # Drain matching chunks from both meters until stopped
+            sample_count = 0
+            while not stop_logging:
+                polled = time.time()
+                available = meter1.points()
+                polled = (polled + time.time()) / 2
+                count = min(available, meter2.points(), chunk_size)
+                if count == 0:
+                    time.sleep(0.05)  # nothing to drain yet
+                    continue
 
-            # Reading the voltage measurement from multimeter 1
-            measurement1 = dmm1.query('MEAS:VOLT:DC?')
-            voltage = float(measurement1)
-            print(f'Voltage: {voltage:.6f} V')
-            csv_out.append(f'{voltage:.6f}')
+                voltage = meter1.remove(count)
+                voltage2 = meter2.remove(count)
+                current = 5000 * voltage2  # convert mV to A
+                power_out = current * voltage / 1000  # current * voltage to get power in kW
+                # The meter's sample timer drifts from the PC clock, so the time base is set again from every poll:
+                # the newest of the available samples was taken about when DATA:POIN? answered
+                sample_times = polled - (available - 1 - np.arange(count)) * sample_interval
+                columns = [voltage, current, voltage2, power_out]
+                if live_efficiency:
+                    # Join the whole chunk to the power meter readings taken meanwhile
+                    pm_values, pm_matched = poller.join(sample_times, pm_tolerance)
+                    efficiency = power_meter.efficiency(power_out, pm_values[:, -1])
+                    columns += list(pm_values.T) + [efficiency]
 
-            # Reading the shunt voltage measurement from multimeter 2
-            measurement2 = dmm2.query('MEAS:VOLT:DC?')
-            voltage2 = float(measurement2)
+                for k in range(count):
+                    sample_time = datetime.fromtimestamp(sample_times[k])
+                    row = [sample_time.strftime('%m/%d/%Y'), sample_time.strftime('%H:%M:%S.%f')[:-3]]
+                    row += [float(column[k]) for column in columns]
+                    if live_efficiency and not pm_matched[k]:
+                        row[6:] = [''] * (len(row) - 6)  # no power meter reading near this sample
+                    csvwriter.writerow(row)
 
-            current = 5000 * voltage2  # convert mV to A
-            power = current * voltage  # current * voltage to get power
-            power_out = power / 1000  # convert to kW
+                stats.update_many(sample_times - start_time, np.column_stack(columns))
+                if write_binary_log:
+                    blog.append_rows(np.column_stack([sample_times] + columns))
 
-            print(f'Current: {current:.6f} A')  # print current
-            print(f'Power: {power_out:.6f} kW')  # print power
-            csv_out.append(f'{current:.6f}')  # add current to CSV
-            csv_out.append(f'{voltage2:.6f}')  # add shunt voltage to CSV
-            csv_out.append(f'{power_out:.6f}')  # add power to CSV
+                sample_count += count
+                print(f"Samples: {sample_count}  Voltage: {voltage[-1]:.6f} V  Current: {current[-1]:.6f} A  Power: {power_out[-1]:.6f} kW"
+                      + (f"  Efficiency: {efficiency[-1]:.4f}" if live_efficiency else ''))
+        else:
+            # Perform multiple readings until stopped
+            reading_count = 0
+            start_time = time.time()
+            while not stop_logging:
+                timestamp = time.strftime('%Y-%m-%d %H:%M:%S')
+                print(f"\nReading {reading_count + 1} at {timestamp}:")
 
-            # Write the measurements to the CSV file
-            csvwriter.writerow(csv_out)  # write all data into CSV
+                now = datetime.now()
+                date1 = now.strftime('%m/%d/%Y')
+                time1 = now.strftime('%H:%M:%S')
+                csv_out = [date1, time1]
 
-            time.sleep(0.2)  # delay by 0.2 seconds
+                # Reading the voltage measurement from multimeter 1 and the shunt voltage measurement from multimeter 2
+                if strategy == 'triggered':
+                    # Both readings taken on the same trigger
+                    voltage, voltage2 = dmm34465a.read_synchronized(pool, [dmm1, dmm2], trigger_source, binary_mode)
+                else:
+                    # One READ? per meter, configured once instead of a MEAS:VOLT:DC? reconfiguring every reading
+                    voltage = meter1.read()
+                    voltage2 = meter2.read()
+                print(f'Voltage: {voltage:.6f} V')
+                csv_out.append(voltage)
 
-            reading_count += 1
+                current = 5000 * voltage2  # convert mV to A
+                power = current * voltage  # current * voltage to get power
+                power_out = power / 1000  # convert to kW
+
+                print(f'Current: {current:.6f} A')  # print current
+                print(f'Power: {power_out:.6f} kW')  # print power
+                csv_out.append(current)  # add current to CSV
+                csv_out.append(voltage2)  # add shunt voltage to CSV
+                csv_out.append(power_out)  # add power to CSV
+
+                if live_efficiency:
+                    pm_values, pm_matched = poller.join(now.timestamp(), pm_tolerance)
+                    if pm_matched[0]:
+                        efficiency = float(power_meter.efficiency(power_out, pm_values[0, -1]))
+                        print(f'Total Power: {pm_values[0, -1]:.6f} kW')
+                        print(f'Efficiency: {efficiency:.4f}')
+                        csv_out += [float(value) for value in pm_values[0]] + [efficiency]
+                    else:
+                        print('No power meter reading')
+                        csv_out += [''] * (len(power_meter.header) + 1)
+
+                stats.update(now.timestamp() - start_time, [np.nan if value == '' else value for value in csv_out[2:]])
+
+                # Write the measurements to the CSV file
+                csvwriter.writerow(csv_out)  # write all data into CSV
+                if write_binary_log:
+                    blog.append(now, [np.nan if value == '' else value for value in csv_out[2:]])
+
+                time.sleep(0.2)  # delay by 0.2 seconds
+
+                reading_count += 1
 
 except pyvisa.VisaIOError as e: #error handling
     print(f"VISA IO Error: {e}")
 except Exception as e:
     print(f"An error occurred: {e}")
 finally:
+    if 'blog' in locals():
+        blog.close()
+
+    if 'stats' in locals():
+        stats.report(summary_filename)
+
+    if 'pool' in locals():
+        pool.shutdown()
+
+    if 'meters' in locals():
+        # ABOR ends buffered sampling however the loop ended, after a crash the meters would go on sampling
+        for meter in meters:
+            try:
+                meter.stop()
+            except pyvisa.VisaIOError as e:
+                print(f"VISA IO Error: {e}")
+
+    if 'poller' in locals():
+        poller.stop()
+        if poller.errors:
+            print(f"{poller.errors} power meter readings failed")
+
+    if 'pm' in locals():
+        pm.close()
+        print("Connection closed.")
+
     # Close the connections
     if 'dmm1' in locals():
         dmm1.close()
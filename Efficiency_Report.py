@@ -0,0 +1,41 @@
+import efficiency_analysis
+
+# Load step detection: a step starts where the DC power changes by more than step_threshold W
+# between the step_window rows before and after (None = 5% of the DC power range)
+step_threshold = None
+step_window = 10
+min_step_rows = 20  # shorter steps are merged into a neighbour
+# Rows in the rolling efficiency window
+rolling_window = 60
+# Also write every row's efficiency and rolling efficiency to <output>_rolling.csv
+write_rolling = False
+
+print('Enter name of the combined AC/DC CSV (without .csv extension):')
+combined_in = input().strip()  # Get user input and remove any leading/trailing whitespace
+
+# Validate input
+if not combined_in:
+    print("Error: Combined CSV name cannot be empty.")
+    exit()
+combined_csv = f'{combined_in}.csv'
+
+print('Enter a name for the step report CSV (without .csv extension):')
+output_filename_in = input().strip()
+
+# Validate input
+if not output_filename_in:
+    print("Error: Output file CSV name cannot be empty.")
+    exit()
+output_filename = f'{output_filename_in}.csv'
+
+data = efficiency_analysis.load_combined(combined_csv)
+step_starts = efficiency_analysis.analyze(data, step_threshold, step_window, min_step_rows, rolling_window)
+steps = efficiency_analysis.write_report(data, step_starts, output_filename)
+if write_rolling:
+    efficiency_analysis.write_rolling(data, f'{output_filename_in}_rolling.csv')
+
+print('')
+print(f"{len(data['time'])} rows in {steps} load steps, report written to {output_filename}")
+print('')
+print('Press Enter to close')
+input()
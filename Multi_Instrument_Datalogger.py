@@ -0,0 +1,182 @@
+import pyvisa
+import simulated_instruments
+import scpi_timing
+import resource_cache
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import scpi_driver
+import daq973a
+import dmm34465a
+import power_meter
+import acquisition_engine
+import batched_writer
+from acquisition_engine import Source
+
+print('Multi Instrument Datalogger: type "stop" to end the datalogging at anytime')
+print('')
+
+################PyVisa Setup##################################################################
+# Resource manager setup
+# Simulate runs the script against simulated_instruments instead of the bench (no instruments needed)
+simulate = False
+rm = simulated_instruments.ResourceManager() if simulate else pyvisa.ResourceManager()
+# Profile SCPI times every instrument command and prints a per-command summary when the script ends
+profile_scpi = False
+if profile_scpi:
+    rm = scpi_timing.instrument(rm, export_path='scpi_timing.json')
+##############################################################################################
+
+####################Device Setup##############################################################################
+daq_resource_string = 'USB0::10893::34305::MY59007195::0::INSTR'  # DAQ973A
+dmm_id1 = 'USB0::0x2A8D::0x0301::MY54507560::INSTR'  # multimeter 1 (ACT0012), bus voltage
+dmm_id2 = 'USB0::0x2A8D::0x0301::MY54505907::INSTR'  # multimeter 2 (ACT0011), shunt voltage
+pm_id = 'USB0::0x0B21::0x0025::XXXXXXXXX::INSTR'  # power meter, set to the serial number on the bench
+
+channels = ['105', '102', '119', '112', '111', '113','114','104','115', '103', '117', '101']
+name = ['HS2', 'T3', 'L10', 'Output Fuse', 'L11', 'J23','Solder Side','HS1','Negative Busbar', 'L2','Top', 'Exhaust Fan']
+thermocouple_type = 'J'
+
+# Minimum time between readings of each instrument in seconds
+daq_interval = 2.0
+dmm_interval = 0.2
+pm_interval = 0.5
+
+# Rows are written by a background thread: flushed every flush_rows rows or flush_interval seconds,
+# and fsync'd to disk every fsync_interval seconds (None = leave it to the OS)
+flush_rows = 100
+flush_interval = 5.0
+fsync_interval = None
+
+print('Enter output file name (without .csv extension):')
+name_input = input().strip()  # Get user input and remove any leading/trailing whitespace
+# Validate input
+if not name_input:
+    print("Error: CSV name cannot be empty.")
+    exit()
+filename = f'{name_input}.csv'
+##############################################################################################################
+
+##############################################################
+# Global flag for stopping the loop.
+# checks if user has input stop and end logging.
+stop_logging = False
+
+def check_for_stop():
+    global stop_logging
+    while not stop_logging:
+        user_input = input().strip().lower()
+        if user_input == 'stop':
+            stop_logging = True
+##############################################################
+
+# Create and start the thread for checking the stop command
+input_thread = threading.Thread(target=check_for_stop)
+input_thread.daemon = True  # Set daemon to allow the program to exit even if the thread is still running
+input_thread.start()
+
+
+def read_daq():
+    """
+    Read one sweep of every channel and append the average temperature.
+    """
+    sweep = daq_driver.read()
+    return list(sweep) + [sweep.mean()]
+
+
+def read_dmms():
+    """
+    Read bus voltage and shunt voltage on one shared trigger and return voltage, current, shunt voltage and power (kW).
+    """
+    if dmm_strategy == 'triggered':
+        voltage, voltage2 = dmm34465a.read_synchronized(dmm_pool, [dmm1, dmm2])
+    else:
+        voltage, voltage2 = meter1.read(), meter2.read()
+    current = 5000 * voltage2  # convert mV to A
+    power_out = current * voltage / 1000  # current * voltage to get power in kW
+    return [voltage, current, voltage2, power_out]
+
+
+def print_record(elapsed, source, values):
+    print(f'{elapsed:10.3f} s  {source.name}: ' + ', '.join(f'{field} {value:.4f}' for field, value in zip(source.fields, values)))
+
+
+try:
+    # Open the CSV file for writing
+    with open(filename, 'w', newline='') as file, batched_writer.BatchedWriter(file, flush_rows, flush_interval, fsync_interval) as csvwriter:
+
+        # Connect to every instrument at its last known address (resource_cache), the bench is only scanned if one moved
+        # Discovery keeps the *IDN? reply it checked each instrument with, so it is not queried again
+        discovery = resource_cache.Discovery(rm)
+        daq = discovery.open(daq_resource_string)
+        daq.timeout = 10000  # Set timeout to 10 seconds
+        print("Connected to:", discovery.idns[daq_resource_string])
+
+        dmm1 = discovery.open(dmm_id1)
+        dmm1.timeout = 10000
+        print("Connected to:", discovery.idns[dmm_id1])
+
+        dmm2 = discovery.open(dmm_id2)
+        dmm2.timeout = 10000
+        print("Connected to:", discovery.idns[dmm_id2])
+
+        pm = discovery.open(pm_id)
+        pm.timeout = 10000
+        print("Connected to:", discovery.idns[pm_id])
+
+        # The drivers build each instrument's setup and read commands once (see scpi_driver): the DAQ reads a sweep
+        # per READ?, the meters autorange and read on one shared bus trigger (single if they can't)
+        daq_driver = daq973a.DAQ973A(daq, channels, thermocouple_type, idn=discovery.idns[daq_resource_string])
+        meters = [dmm34465a.DMM34465A(dmm, ['triggered'], 'AUTO', 'DEF', idn=discovery.idns[dmm_id])
+                  for dmm, dmm_id in ((dmm1, dmm_id1), (dmm2, dmm_id2))]
+        meter1, meter2 = meters
+        dmm_strategy = scpi_driver.use_fastest(meters, ['triggered'])
+        print(f"Reading the DAQ with the {daq_driver.strategy} strategy and the multimeters with the {dmm_strategy} strategy")
+
+        # Configure every instrument once before logging starts, one write each
+        daq_driver.configure()
+        meter1.configure()
+        meter2.configure()
+        dmm_pool = ThreadPoolExecutor(max_workers=2)
+        power_meter.configure(pm)
+
+        sources = [
+            Source('DAQ', name + ['Avg Temp (C)'], read_daq, daq_interval),
+            Source('DMM', ['Voltage (V)', 'Current (A)', 'Voltage of shunt (V)', 'Power (kW)'], read_dmms, dmm_interval),
+            Source('Power Meter', power_meter.header, lambda: power_meter.read(pm), pm_interval),
+        ]
+
+        # Write the header
+        csvwriter.writerow(acquisition_engine.header(sources))
+
+        # Poll all instruments concurrently until stopped
+        acquisition_engine.run(sources, csvwriter, lambda: stop_logging, print_record)
+
+except pyvisa.VisaIOError as e: #error handling
+    print(f"VISA IO Error: {e}")
+except Exception as e:
+    print(f"An error occurred: {e}")
+finally:
+    if 'dmm_pool' in locals():
+        dmm_pool.shutdown()
+
+    # Close the connections
+    if 'daq' in locals():
+        daq.close()
+        print("Connection closed.")
+
+    if 'dmm1' in locals():
+        dmm1.close()
+        print("Connection closed.")
+
+    if 'dmm2' in locals():
+        dmm2.close()
+        print("Connection closed.")
+
+    if 'pm' in locals():
+        pm.close()
+        print("Connection closed.")
+
+print('')
+print('')
+print('Press Enter to close')
+input() #ends the program
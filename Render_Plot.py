@@ -0,0 +1,23 @@
+import os
+import plot_render
+
+print('Enter name of the DAQ log (without .csv or .actlog extension):')
+log_in = input().strip()  # Get user input and remove any leading/trailing whitespace
+
+# Validate input
+if not log_in:
+    print("Error: Log name cannot be empty.")
+    exit()
+
+# The binary log is much faster to read, use it when the run wrote one
+log_filename = f'{log_in}.actlog' if os.path.exists(f'{log_in}.actlog') else f'{log_in}.csv'
+png_filename = f'{log_in}.png'
+
+if plot_render.render(log_filename, png_filename, subtitle=f'File: {log_in}.csv'):
+    print(f'Plot of {log_filename} saved as {png_filename}')
+else:
+    print("No data available for plotting.")
+
+print('')
+print('Press Enter to close')
+input()
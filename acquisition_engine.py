@@ -0,0 +1,106 @@
+"""
+Concurrent multi-instrument acquisition on one shared clock.
+
+Every instrument is polled by its own asyncio task. The blocking VISA calls run
+in worker threads, so a slow instrument only delays its own readings. Each
+reading is stamped from one monotonic clock and all of them go to a single
+writer, which produces one unified record stream (one CSV) for the whole bench.
+
+Readings finish in a different order than they were stamped (a sweep of the
+DAQ takes longer than a DMM reading), so the writer holds each row back until
+no reading still in progress can have an earlier stamp, and the stream is in
+ascending Elapsed (s) order.
+"""
+import asyncio
+import heapq
+import itertools
+import math
+import time
+from timebase import Clock
+
+
+class Source:
+    """
+    One instrument polled by the engine.
+
+    read is a blocking function returning one value per field.
+    interval is the minimum time between the starts of two readings, in seconds.
+    """
+    def __init__(self, name, fields, read, interval):
+        self.name = name
+        self.fields = fields
+        self.read = read
+        self.interval = interval
+
+
+def header(sources):
+    """
+    Return the CSV header of the unified record stream for these sources.
+    """
+    return ['Elapsed (s)', 'Date', 'Time', 'Source'] + [field for source in sources for field in source.fields]
+
+
+async def _poll(source, clock, queue, in_flight, should_stop):
+    while not should_stop():
+        started = time.monotonic()
+        # Stamp the reading at the moment it was requested
+        elapsed, wall = clock.now()
+        in_flight[source.name] = elapsed
+        values = await asyncio.to_thread(source.read)
+        del in_flight[source.name]
+        await queue.put((elapsed, wall, source, values))
+        await asyncio.sleep(max(0.0, source.interval - (time.monotonic() - started)))
+
+
+async def _write(sources, queue, in_flight, csvwriter, on_record):
+    # Column of the first field of each source in the unified row
+    offsets = {}
+    column = 4
+    for source in sources:
+        offsets[source.name] = column
+        column += len(source.fields)
+
+    def write(record):
+        elapsed, wall, source, values = record
+        row = [''] * column
+        row[:4] = [f'{elapsed:.3f}', wall.strftime('%m/%d/%Y'), wall.strftime('%H:%M:%S.%f')[:-3], source.name]
+        start = offsets[source.name]
+        row[start:start + len(values)] = [float(value) for value in values]
+        csvwriter.writerow(row)
+        if on_record is not None:
+            on_record(elapsed, source, values)
+
+    held = []  # heap of (stamp, arrival, record) not written yet
+    arrival = itertools.count()
+    while True:
+        record = await queue.get()
+        if record is None:
+            break
+        heapq.heappush(held, (record[0], next(arrival), record))
+        # Readings requested from now on get later stamps, so only the ones in progress can still come before a held row
+        oldest = min(in_flight.values(), default=math.inf)
+        while held and held[0][0] < oldest:
+            write(heapq.heappop(held)[2])
+
+    while held:
+        write(heapq.heappop(held)[2])
+
+
+async def _run(sources, csvwriter, should_stop, on_record):
+    clock = Clock()
+    queue = asyncio.Queue()
+    in_flight = {}  # source name -> stamp of its reading in progress
+    writer = asyncio.create_task(_write(sources, queue, in_flight, csvwriter, on_record))
+    try:
+        await asyncio.gather(*(_poll(source, clock, queue, in_flight, should_stop) for source in sources))
+    finally:
+        await queue.put(None)
+        await writer
+
+
+def run(sources, csvwriter, should_stop, on_record=None):
+    """
+    Poll all sources concurrently and write every reading to csvwriter, in stamp order, until should_stop() returns True.
+    on_record(elapsed, source, values) is called for every record written, e.g. to print it.
+    """
+    asyncio.run(_run(sources, csvwriter, should_stop, on_record))
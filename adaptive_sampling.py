@@ -0,0 +1,82 @@
+"""
+Adaptive sample interval for the DAQ loggers.
+
+A thermal test spends most of its hours in steady state, where a sweep every
+half second only makes the log bigger. Scheduler sweeps every min_interval
+seconds while anything is moving and backs off (backoff times longer after
+every quiet sweep) to one sweep every max_interval seconds once every channel
+is stable.
+
+A channel is moving when its rate of change, measured over rate_window
+seconds, is above rate_threshold (°C/min), or when it has stepped more than
+deviation_threshold (°C) from the start of the window, e.g. right after a
+load step. A step restarts the window, so sampling stays fast for at least
+one window after it. Only the start of the window is kept, memory does not
+grow with the run.
+"""
+import time
+
+import numpy as np
+
+
+class Scheduler:
+    """
+    Picks the interval until the next sweep from the sweeps so far.
+    Call update after every sweep, then wait until the next one is due.
+    """
+    def __init__(self, min_interval=0.5, max_interval=30.0, rate_threshold=0.5, deviation_threshold=1.0,
+                 rate_window=60.0, backoff=1.5):
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.rate_threshold = rate_threshold  # °C/min
+        self.deviation_threshold = deviation_threshold  # °C
+        self.rate_window = rate_window  # seconds
+        self.backoff = backoff
+        self.interval = min_interval  # seconds until the next sweep
+        self.effective = 0.0  # seconds between the last two sweeps, the value logged with each row
+        self.rate = None  # highest rate of change over the last full window (°C/min), None until one has passed
+        self.start = time.monotonic()
+        self.taken = None
+        self.previous = None
+        self.window_start = None
+        self.window_sweep = None
+
+    def update(self, sweep, elapsed=None):
+        """
+        Take in one sweep taken elapsed seconds into the run (monotonic time since the Scheduler was made if None)
+        and return the interval until the next sweep.
+        """
+        self.taken = time.monotonic()
+        if elapsed is None:
+            elapsed = self.taken - self.start
+        sweep = np.asarray(sweep, dtype=float)
+        self.effective = 0.0 if self.previous is None else elapsed - self.previous
+        self.previous = elapsed
+        if self.window_sweep is None:
+            self.window_start, self.window_sweep = elapsed, sweep
+
+        change = np.max(np.abs(sweep - self.window_sweep))
+        if change > self.deviation_threshold:
+            # A step: measure from the new level and stay fast for a whole window
+            self.window_start, self.window_sweep = elapsed, sweep
+            self.rate = None
+        elif elapsed - self.window_start >= self.rate_window:
+            self.rate = change / (elapsed - self.window_start) * 60
+            self.window_start, self.window_sweep = elapsed, sweep
+
+        if self.rate is None or self.rate > self.rate_threshold:
+            self.interval = self.min_interval
+        else:
+            self.interval = min(self.interval * self.backoff, self.max_interval)
+        return self.interval
+
+    def wait(self, stop=lambda: False):
+        """
+        Sleep until the next sweep is due, returning early once stop() is true.
+        """
+        due = self.taken + self.interval
+        while not stop():
+            remaining = due - time.monotonic()
+            if remaining <= 0:
+                break
+            time.sleep(min(remaining, 0.25))
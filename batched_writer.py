@@ -0,0 +1,104 @@
+"""
+Background CSV writer for the dataloggers.
+
+Rows are handed over to a writer thread through a queue, so formatting and
+disk I/O never delay the next instrument read. The thread formats floats and
+writes rows in batches, flushes to the OS after flush_rows rows or
+flush_interval seconds (whichever comes first), and optionally calls fsync
+every fsync_interval seconds so a crash or power cut loses at most that much
+of the log.
+"""
+import csv
+import os
+import queue
+import threading
+import time
+
+_STOP = object()
+
+
+class BatchedWriter:
+    """
+    Drop-in replacement for csv.writer that writes from a background thread.
+
+    Floats in a row are formatted with float_format, everything else is written as is.
+    Use it as a context manager (or call close()) so every row is on disk before the file closes.
+    """
+    def __init__(self, file, flush_rows=100, flush_interval=5.0, fsync_interval=None, float_format='.6f'):
+        self.file = file
+        self.flush_rows = flush_rows
+        self.flush_interval = flush_interval
+        self.fsync_interval = fsync_interval
+        self.float_format = float_format
+        self.error = None
+        self.queue = queue.Queue()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def writerow(self, row):
+        if self.error is not None:
+            raise self.error
+        self.queue.put(row)
+
+    def writerows(self, rows):
+        for row in rows:
+            self.writerow(row)
+
+    def close(self):
+        """
+        Write every queued row, flush (and fsync if enabled) and stop the writer thread.
+        """
+        if self.thread.is_alive():
+            self.queue.put(_STOP)
+            self.thread.join()
+        if self.error is not None:
+            raise self.error
+
+    def _format(self, rows):
+        fmt = self.float_format
+        return [[format(value, fmt) if isinstance(value, float) else value for value in row] for row in rows]
+
+    def _run(self):
+        csvwriter = csv.writer(self.file)
+        unflushed = 0
+        next_flush = time.monotonic() + self.flush_interval
+        next_fsync = time.monotonic() + (self.fsync_interval or 0)
+        stopping = False
+        try:
+            while not stopping:
+                # Wait for rows, but never past the next timed flush
+                try:
+                    batch = [self.queue.get(timeout=max(0.0, next_flush - time.monotonic()))]
+                except queue.Empty:
+                    batch = []
+                # Take everything else that is already waiting
+                while True:
+                    try:
+                        batch.append(self.queue.get_nowait())
+                    except queue.Empty:
+                        break
+                if batch and batch[-1] is _STOP:
+                    batch.pop()
+                    stopping = True
+
+                if batch:
+                    csvwriter.writerows(self._format(batch))
+                    unflushed += len(batch)
+
+                now = time.monotonic()
+                if stopping or unflushed >= self.flush_rows or now >= next_flush:
+                    self.file.flush()
+                    unflushed = 0
+                    next_flush = now + self.flush_interval
+                    if self.fsync_interval is not None and (stopping or now >= next_fsync):
+                        os.fsync(self.file.fileno())
+                        next_fsync = now + self.fsync_interval
+        except Exception as e:
+            # Reported to the acquisition loop on its next writerow or on close
+            self.error = e
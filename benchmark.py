@@ -0,0 +1,339 @@
+"""
+Throughput and latency benchmarks of the acquisition loops.
+
+Runs the DAQ_v5 and Dual_DMM_Datalogger_v3 loops against simulated_instruments
+(no bench needed) and reports, for every loop:
+
+    rate      sweeps (or samples) per second and channel-readings per second
+    stages    p50/p90/p99 time of every step of the loop in ms: the driver
+              read (VISA I/O and parsing), row formatting, CSV hand-off
+              and plot redraw
+    age       p50/p90/p99 time from the moment a sample was requested until it
+              reached the end of the pipeline (drawn on the plot, or handed
+              to the CSV writer for the DMM loops)
+
+The instruments are configured and read through the same drivers as the
+loggers (daq973a.DAQ973A, dmm34465a.DMM34465A, see scpi_driver), with the
+same strategy choice, so the numbers describe what the loggers run.
+
+The loops run flat out (no sleep between readings), against instruments that
+answer instantly unless --latency/--reading-time are given, so the numbers
+are the cost of the scripts themselves. Results can be saved as a baseline
+and later runs are compared against it; a rate drop or latency rise of more
+than --tolerance is reported as a regression (exit code 1).
+
+Examples:
+    python benchmark.py --save-baseline
+    python benchmark.py
+    python benchmark.py --only daq-binary dmm-buffered --latency 0.002
+"""
+import argparse
+import io
+import json
+import os
+import queue
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime
+
+import numpy as np
+
+import batched_writer
+import daq973a
+import dmm34465a
+import ring_buffer
+import scpi_driver
+import simulated_instruments
+import timebase
+
+channels = ['105', '102', '119', '112', '111', '113', '114', '104', '115', '103', '117', '101']
+percentiles = [50, 90, 99]
+
+
+class Recorder:
+    """
+    Collects the duration of every stage of a loop and the age of every sample.
+    """
+    def __init__(self):
+        self.stages = defaultdict(list)
+        self.ages = []
+
+    @contextmanager
+    def stage(self, name):
+        started = time.perf_counter()
+        yield
+        self.stages[name].append(time.perf_counter() - started)
+
+    def result(self, count, readings_per_count, duration):
+        def summary(values):
+            return {f'p{p}': float(v) * 1000 for p, v in zip(percentiles, np.percentile(values, percentiles))}
+        return {'rate': count / duration,
+                'readings_per_s': count * readings_per_count / duration,
+                'stages': {name: summary(values) for name, values in self.stages.items()},
+                'age': summary(self.ages) if self.ages else {}}
+
+
+def bench_daq(rm, duration, binary=False, plot=True, fps=2):
+    """
+    DAQ_v5 loop: driver reads (scan) on a worker thread, CSV through the batched writer, blitted live plot on this thread.
+    """
+    daq = rm.open_resource(simulated_instruments.default_resources[0])
+    driver = daq973a.DAQ973A(daq, channels, binary=binary, allowed=['scan'])
+    driver.configure()
+    recorder = Recorder()
+    history = ring_buffer.DecimatedHistory(len(channels))
+    sample_queue = queue.Queue()
+    clock = timebase.Clock()
+    console = io.StringIO()
+    done = threading.Event()
+    sweeps = 0
+
+    if plot:
+        import matplotlib
+        matplotlib.use('Agg')
+        import matplotlib.pyplot as plt
+        import live_plot
+        fig, ax = plt.subplots(figsize=(12, 8))
+        lines = {channel: ax.plot([], [], label=f'Channel {channel}')[0] for channel in channels}
+        ax.set_ylim(20, 100)
+        ax.set_xlim(0, 10)
+        ax.legend(loc='upper right')
+        live = live_plot.LivePlot(fig, ax, lines, history, fps)
+        fig.canvas.draw()
+
+    def acquire():
+        nonlocal sweeps
+        end = time.monotonic() + duration
+        while time.monotonic() < end:
+            elapsed, now = clock.now()
+            with recorder.stage('read'):
+                sweep = driver.read()
+            with recorder.stage('format'):
+                row = [f'{now:%m/%d/%Y}', f'{now:%H:%M:%S}'] + list(sweep)
+                average = sum(sweep) / len(sweep)
+                row += [average, average * 1.8 + 32]
+                for j, value in enumerate(sweep):
+                    print(f'{channels[j]}: {value:.6f} °C', file=console)
+                console.seek(0)
+                console.truncate()
+            with recorder.stage('csv'):
+                csvwriter.writerow(row)
+            sample_queue.put((elapsed, list(sweep)))
+            sweeps += 1
+        done.set()
+
+    with tempfile.TemporaryDirectory() as folder, open(os.path.join(folder, 'daq.csv'), 'w', newline='') as file, \
+            batched_writer.BatchedWriter(file) as csvwriter:
+        thread = threading.Thread(target=acquire)
+        started = time.monotonic()
+        thread.start()
+        # Same frame loop as LivePlot.run, with the age of every sample taken once it is drawn
+        next_frame = time.monotonic()
+        while True:
+            finished = done.is_set()
+            drawn = []
+            while True:
+                try:
+                    elapsed, values = sample_queue.get_nowait()
+                except queue.Empty:
+                    break
+                history.append(elapsed / 60, values)
+                drawn.append(elapsed)
+            if drawn:
+                if plot:
+                    with recorder.stage('plot'):
+                        live.update()
+                now = clock.now()[0]
+                recorder.ages += [now - elapsed for elapsed in drawn]
+            if finished:
+                break
+            next_frame += 1 / fps
+            time.sleep(max(0.0, next_frame - time.monotonic()))
+        thread.join()
+        run_time = time.monotonic() - started
+    if plot:
+        plt.close(fig)
+    daq.close()
+    return recorder.result(sweeps, len(channels), run_time)
+
+
+def bench_dmm(rm, duration, mode='single'):
+    """
+    Dual_DMM_Datalogger_v3 loop without the 0.2 s pause: 'single' (READ? as text), 'binary' (READ? as float64),
+    'sync' (shared *TRG, fetched on two threads) or 'buffered' (timed sampling drained with DATA:REM?).
+    The meters are set up through the drivers the way the logger sets them up for the same mode.
+    """
+    dmm1 = rm.open_resource(simulated_instruments.default_resources[1])
+    dmm2 = rm.open_resource(simulated_instruments.default_resources[2])
+    allowed = ['buffered'] if mode == 'buffered' else ['triggered'] if mode == 'sync' else []
+    binary = mode in ('binary', 'buffered')
+    # Same ranges as the logger: a fixed range per meter for buffered sampling, autorange otherwise
+    ranges = (10, 0.1) if mode == 'buffered' else ('AUTO', 'AUTO')
+    meters = [dmm34465a.DMM34465A(dmm, allowed, volt_range, 'DEF', 0.02, 0.001, 'BUS', binary)
+              for dmm, volt_range in zip((dmm1, dmm2), ranges)]
+    meter1, meter2 = meters
+    strategy = scpi_driver.use_fastest(meters, allowed)
+    for meter in meters:
+        meter.configure()
+    recorder = Recorder()
+    clock = timebase.Clock()
+    pool = None
+    count = 0
+
+    with tempfile.TemporaryDirectory() as folder, open(os.path.join(folder, 'dmm.csv'), 'w', newline='') as file, \
+            batched_writer.BatchedWriter(file) as csvwriter:
+        if strategy in ('buffered', 'triggered'):
+            pool = ThreadPoolExecutor(max_workers=2)
+        if strategy == 'buffered':
+            dmm34465a.trigger(pool, [dmm1, dmm2], 'BUS')
+            start = time.monotonic()
+            end = start + duration
+            while time.monotonic() < end:
+                with recorder.stage('poll'):
+                    polled = time.time()
+                    points = meter1.points()
+                    polled = (polled + time.time()) / 2
+                    available = min(points, meter2.points(), 5000)
+                if available == 0:
+                    time.sleep(0.05)
+                    continue
+                with recorder.stage('read'):
+                    voltage = meter1.remove(available)
+                    voltage2 = meter2.remove(available)
+                with recorder.stage('parse'):
+                    current = 5000 * voltage2
+                    power_out = current * voltage / 1000
+                with recorder.stage('format'):
+                    rows = []
+                    for k in range(available):
+                        sample_time = datetime.fromtimestamp(polled - (points - 1 - k) * 0.001)
+                        rows.append([sample_time.strftime('%m/%d/%Y'), sample_time.strftime('%H:%M:%S.%f')[:-3],
+                                     voltage[k], current[k], voltage2[k], power_out[k]])
+                with recorder.stage('csv'):
+                    csvwriter.writerows(rows)
+                handed_over = time.monotonic() - start
+                recorder.ages += list(handed_over - (count + np.arange(available)) * 0.001)
+                count += available
+            meter1.stop()
+            meter2.stop()
+        else:
+            start = time.monotonic()
+            end = start + duration
+            while time.monotonic() < end:
+                requested, now = clock.now()
+                with recorder.stage('read'):
+                    if strategy == 'triggered':
+                        voltage, voltage2 = dmm34465a.read_synchronized(pool, [dmm1, dmm2], 'BUS', binary)
+                    else:
+                        voltage = meter1.read()
+                        voltage2 = meter2.read()
+                with recorder.stage('format'):
+                    current = 5000 * voltage2
+                    power_out = current * voltage / 1000
+                    row = [f'{now:%m/%d/%Y}', f'{now:%H:%M:%S}', voltage, current, voltage2, power_out]
+                with recorder.stage('csv'):
+                    csvwriter.writerow(row)
+                recorder.ages.append(clock.now()[0] - requested)
+                count += 1
+        run_time = time.monotonic() - start
+
+    if pool is not None:
+        pool.shutdown()
+    dmm1.close()
+    dmm2.close()
+    return recorder.result(count, 2, run_time)
+
+
+benchmarks = {
+    'daq-ascii': lambda rm, duration, plot: bench_daq(rm, duration, binary=False, plot=plot),
+    'daq-binary': lambda rm, duration, plot: bench_daq(rm, duration, binary=True, plot=plot),
+    'dmm-single': lambda rm, duration, plot: bench_dmm(rm, duration, 'single'),
+    'dmm-binary': lambda rm, duration, plot: bench_dmm(rm, duration, 'binary'),
+    'dmm-sync': lambda rm, duration, plot: bench_dmm(rm, duration, 'sync'),
+    'dmm-buffered': lambda rm, duration, plot: bench_dmm(rm, duration, 'buffered'),
+}
+
+
+def compare(results, baseline, tolerance=0.2, floor_ms=0.05):
+    """
+    Return a list of regressions of results against baseline: a rate more than tolerance lower,
+    or a stage or age p50/p99 more than tolerance (and floor_ms) higher.
+    """
+    regressions = []
+    for name, result in results.items():
+        base = baseline.get(name)
+        if base is None:
+            continue
+        if result['rate'] < base['rate'] * (1 - tolerance):
+            regressions.append(f"{name}: rate {result['rate']:.1f}/s, baseline {base['rate']:.1f}/s")
+        timings = [(f'stage {stage}', values, base['stages'].get(stage, {})) for stage, values in result['stages'].items()]
+        timings.append(('age', result['age'], base.get('age', {})))
+        for label, values, base_values in timings:
+            for key in ('p50', 'p99'):
+                if key in values and key in base_values and \
+                        values[key] > base_values[key] * (1 + tolerance) and values[key] - base_values[key] > floor_ms:
+                    regressions.append(f'{name}: {label} {key} {values[key]:.3f} ms, baseline {base_values[key]:.3f} ms')
+    return regressions
+
+
+def print_result(name, result):
+    print(f"{name}: {result['rate']:.1f}/s, {result['readings_per_s']:.0f} readings/s")
+    for stage, values in result['stages'].items():
+        print(f"    {stage:<8}" + '  '.join(f'{key} {value:8.3f} ms' for key, value in values.items()))
+    if result['age']:
+        print(f"    {'age':<8}" + '  '.join(f'{key} {value:8.3f} ms' for key, value in result['age'].items()))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the acquisition loops against simulated instruments.')
+    parser.add_argument('--only', nargs='+', choices=list(benchmarks), help='benchmarks to run (default all)')
+    parser.add_argument('--duration', type=float, default=5.0, help='seconds per benchmark (default 5)')
+    parser.add_argument('--latency', type=float, default=0.0, help='simulated seconds per query (default 0)')
+    parser.add_argument('--reading-time', type=float, default=0.0, help='simulated seconds per reading (default 0)')
+    parser.add_argument('--no-plot', action='store_true', help='leave the plot out of the DAQ loop')
+    parser.add_argument('--baseline', default=os.path.join(os.path.dirname(os.path.abspath(__file__)), 'benchmark_baseline.json'),
+                        help='baseline file (default benchmark_baseline.json next to this script)')
+    parser.add_argument('--save-baseline', action='store_true', help='store these results as the new baseline')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='allowed change against the baseline (default 0.2 = 20%%)')
+    parser.add_argument('--output', help='also write the results to this JSON file')
+    args = parser.parse_args()
+
+    rm = simulated_instruments.ResourceManager(latency=args.latency, reading_time=args.reading_time, seed=0)
+    results = {}
+    for name in args.only or benchmarks:
+        results[name] = benchmarks[name](rm, args.duration, not args.no_plot)
+        print_result(name, results[name])
+
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(results, file, indent=2)
+
+    if args.save_baseline:
+        baseline = {}
+        if os.path.exists(args.baseline):
+            with open(args.baseline) as file:
+                baseline = json.load(file)
+        baseline.update(results)
+        with open(args.baseline, 'w') as file:
+            json.dump(baseline, file, indent=2)
+        print(f'\nBaseline saved to {args.baseline}')
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print('\nNo baseline yet, store one with --save-baseline')
+        return 0
+    with open(args.baseline) as file:
+        regressions = compare(results, json.load(file), args.tolerance)
+    print('')
+    for regression in regressions:
+        print(f'REGRESSION {regression}')
+    print(f'{len(regressions)} regressions against {args.baseline}')
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,120 @@
+"""
+Compact binary log written next to (or instead of) the CSV.
+
+File layout:
+    b'ACTLOG1\n'                       magic
+    uint32 (little-endian)             length of the JSON header
+    JSON header                        {"columns": [...]}, padded with spaces to a multiple of 8 bytes
+    float64 rows (little-endian)       one fixed-width row per sample, len(columns) values
+
+The first column is always 'Timestamp' (seconds since the epoch), the other
+columns are the same as the CSV after its Date and Time columns. Rows are only
+ever appended, so the file can be read while a test is still running, and
+open_log maps it with numpy.memmap: nothing is parsed and a column of a
+multi-day log is a strided view (data[:, j]) instead of a text re-read.
+"""
+import csv
+import json
+import struct
+import time
+from datetime import datetime
+
+import numpy as np
+
+MAGIC = b'ACTLOG1\n'
+
+
+class BinaryLogWriter:
+    """
+    Append-only writer. columns are the names of the values after the timestamp.
+    Appended rows are flushed to the file at least every flush_interval seconds (None = only when the
+    buffer fills), the same cadence as batched_writer, so a crash loses no more of the log than of the CSV.
+    """
+    def __init__(self, path, columns, flush_interval=5.0):
+        self.columns = ['Timestamp'] + list(columns)
+        self.flush_interval = flush_interval
+        self.file = open(path, 'wb')
+        header = json.dumps({'columns': self.columns}).encode()
+        header += b' ' * (-(len(MAGIC) + 4 + len(header)) % 8)  # keep the rows 8-byte aligned
+        self.file.write(MAGIC + struct.pack('<I', len(header)) + header)
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def append(self, timestamp, values):
+        """
+        Append one row: timestamp (datetime or epoch seconds) and one value per column.
+        """
+        if isinstance(timestamp, datetime):
+            timestamp = timestamp.timestamp()
+        row = np.empty(len(self.columns), dtype='<f8')
+        row[0] = timestamp
+        row[1:] = values
+        self.file.write(row.tobytes())
+        self._flush_if_due()
+
+    def append_rows(self, rows):
+        """
+        Append a block of rows at once, rows is a 2D array whose first column is the epoch timestamp.
+        """
+        self.file.write(np.ascontiguousarray(rows, dtype='<f8').tobytes())
+        self._flush_if_due()
+
+    def _flush_if_due(self):
+        if self.flush_interval is not None and time.monotonic() - self.last_flush >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        self.file.flush()
+        self.last_flush = time.monotonic()
+
+    def close(self):
+        self.file.close()
+
+
+def read_header(path):
+    """
+    Return (columns, offset of the first row) of a binary log.
+    """
+    with open(path, 'rb') as file:
+        if file.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not a binary log")
+        (length,) = struct.unpack('<I', file.read(4))
+        columns = json.loads(file.read(length))['columns']
+    return columns, len(MAGIC) + 4 + length
+
+
+def open_log(path):
+    """
+    Map a binary log read-only. Returns (columns, data) where data has one row per sample.
+    A partly written last row (log still running or cut off) is left out.
+    """
+    columns, offset = read_header(path)
+    with open(path, 'rb') as file:
+        file.seek(0, 2)
+        n_rows = (file.tell() - offset) // (8 * len(columns))
+    if n_rows == 0:
+        return columns, np.empty((0, len(columns)))
+    return columns, np.memmap(path, dtype='<f8', mode='r', offset=offset, shape=(n_rows, len(columns)))
+
+
+def to_csv(path, csv_path, milliseconds=False, chunk_rows=100000):
+    """
+    Convert a binary log to the logger CSV layout: Date, Time, then every other column.
+    milliseconds adds .mmm to the Time column (as the buffered Dual DMM logger writes it).
+    Returns the number of rows written.
+    """
+    columns, data = open_log(path)
+    with open(csv_path, 'w', newline='') as file:
+        csvwriter = csv.writer(file)
+        csvwriter.writerow(['Date', 'Time'] + columns[1:])
+        for start in range(0, len(data), chunk_rows):
+            for row in data[start:start + chunk_rows]:
+                sample_time = datetime.fromtimestamp(row[0])
+                time1 = sample_time.strftime('%H:%M:%S.%f')[:-3] if milliseconds else sample_time.strftime('%H:%M:%S')
+                csvwriter.writerow([sample_time.strftime('%m/%d/%Y'), time1] + [f'{value:.6f}' for value in row[1:]])
+    return len(data)
@@ -0,0 +1,113 @@
+"""
+Helpers for the Keysight DAQ973A used by the DAQ datalogger scripts.
+
+Scan mode sets the channel list up once and reads a whole sweep back with a
+single READ? instead of one MEAS:TEMP? round trip per channel. DAQ973A is the
+driver (see scpi_driver) the scripts read through: it picks scan mode when the
+script allows it and sends the whole setup in one write.
+"""
+import time
+
+import numpy as np
+
+import scpi_binary
+import scpi_driver
+import timebase
+
+
+def scan_order(channels):
+    """
+    Return the index of each channel in the scan list.
+
+    The DAQ973A always scans in ascending channel order, no matter what order
+    the channels were given in, so readings have to be put back in the order
+    of the script's channels (and name) list.
+    """
+    scanned = sorted(channels, key=int)
+    return [scanned.index(channel) for channel in channels]
+
+
+def scan_commands(channels, thermocouple_type='J', unit='C', binary=False, timestamps=False):
+    """
+    Return the commands that configure all channels for thermocouple measurement and set them as the scan list.
+    With binary=True the sweep is transferred as a float64 block (see scpi_binary).
+    With timestamps=True every reading carries the DAQ's own time stamp, read it with read_scan_timed.
+    """
+    scan_list = ','.join(channels)
+    commands = [f'CONF:TEMP TC,{thermocouple_type},(@{scan_list})',
+                f'UNIT:TEMP {unit},(@{scan_list})',
+                f'ROUT:SCAN (@{scan_list})',
+                'TRIG:SOUR IMM',  # start the sweep as soon as READ?/INIT is sent
+                'TRIG:COUN 1',  # one sweep per READ?
+                'FORM:READ:CHAN OFF']  # only return the readings, no channel numbers
+    if timestamps:
+        commands += ['FORM:READ:TIME ON',
+                     'FORM:READ:TIME:TYPE ABS']  # year,month,day,hour,minute,second after each reading
+    else:
+        commands += ['FORM:READ:TIME OFF']
+    commands += ['FORM:READ:UNIT OFF']
+    if binary:
+        commands += scpi_binary.binary_commands
+    return commands
+
+
+def read_scan(daq, order, binary=False):
+    """
+    Run one sweep and return every channel's reading as a NumPy array, in channel list order.
+    """
+    return scpi_binary.query_readings(daq, 'READ?', binary)[order]
+
+
+def read_scan_timed(daq, order, binary=False):
+    """
+    Run one sweep configured with timestamps=True.
+    Returns the readings in channel list order and the DAQ's time stamp of the first reading of the sweep.
+    """
+    fields = scpi_binary.query_readings(daq, 'READ?', binary).reshape(-1, 7)
+    return fields[order, 0], timebase.from_fields(*fields[0, 1:])
+
+
+class DAQ973A(scpi_driver.Driver):
+    """
+    Thermocouple channels of a DAQ973A, read a sweep at a time with the scan strategy when allowed,
+    else one MEAS:TEMP? per channel (single). binary and timestamps only apply to scan.
+    """
+    def __init__(self, session, channels, thermocouple_type='J', unit='C', binary=False, timestamps=False, allowed=('scan',),
+                 idn=None):
+        self.channels = list(channels)
+        self.thermocouple_type = thermocouple_type
+        self.unit = unit
+        self.binary_requested = binary
+        self.timestamps_requested = timestamps
+        self.order = scan_order(self.channels)
+        super().__init__(session, allowed, idn)
+
+    def compile(self, strategy):
+        self.binary = self.binary_requested and strategy == 'scan'
+        self.timestamps = self.timestamps_requested and strategy == 'scan'
+        if strategy == 'scan':
+            return scan_commands(self.channels, self.thermocouple_type, self.unit, self.binary, self.timestamps)
+        channel_list = ','.join(self.channels)
+        self.read_commands = [f'MEAS:TEMP? TC,{self.thermocouple_type},(@{channel})' for channel in self.channels]
+        return [f'CONF:TEMP TC,{self.thermocouple_type},(@{channel_list})',
+                f'UNIT:TEMP {self.unit},(@{channel_list})',
+                'INIT']
+
+    def configure(self):
+        super().configure()
+        if self.strategy == 'single':
+            time.sleep(0.5)  # let the INIT settle before the first MEAS:TEMP?
+
+    def read(self):
+        """
+        Return one reading of every channel as a NumPy array, in channel list order.
+        """
+        if self.strategy == 'scan':
+            return read_scan(self.session, self.order, self.binary)
+        return np.array([float(self.session.query(command)) for command in self.read_commands])
+
+    def read_timed(self):
+        """
+        Return the readings in channel list order and the DAQ's time stamp of the sweep (timestamps=True only).
+        """
+        return read_scan_timed(self.session, self.order, self.binary)
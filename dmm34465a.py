@@ -0,0 +1,130 @@
+"""
+Helpers for the Keysight 34465A used by the Dual DMM datalogger scripts.
+
+Buffered mode lets the meter take readings on its own sample timer into its
+reading memory, and the script drains the memory in chunks with DATA:REMove?,
+so the sample rate is set by the meter (up to kHz) instead of the loop.
+DMM34465A is the driver (see scpi_driver) the scripts read through: it picks
+the fastest of buffered, triggered and single the script allows and sends the
+whole setup in one write.
+"""
+import scpi_binary
+import scpi_driver
+
+
+def buffered_commands(nplc=0.02, sample_interval=0.001, sample_count=1000000000, volt_range=10, trigger_source='BUS'):
+    """
+    Return the commands for timed DC voltage sampling into reading memory.
+    Sampling starts on the first trigger after INIT, so several meters can be started together (see trigger),
+    and runs until sample_count readings or ABOR.
+    """
+    return [f'CONF:VOLT:DC {volt_range}',
+            f'VOLT:DC:NPLC {nplc}',  # integration time, lower is faster
+            'VOLT:DC:ZERO:AUTO OFF',  # autozero on every reading halves the rate
+            f'TRIG:SOUR {trigger_source}',
+            'TRIG:DEL 0',  # first sample as soon as the trigger arrives
+            'TRIG:COUN 1',
+            'SAMP:SOUR TIM',  # take samples on the internal timer...
+            f'SAMP:TIM {sample_interval}',  # ...every sample_interval seconds
+            f'SAMP:COUN {sample_count}']
+
+
+def points(dmm):
+    """
+    Return the number of readings waiting in reading memory.
+    """
+    return int(dmm.query('DATA:POIN?'))
+
+
+def remove_readings(dmm, count, binary=False):
+    """
+    Remove the oldest count readings from reading memory and return them as a NumPy array.
+    """
+    return scpi_binary.query_readings(dmm, f'DATA:REM? {count}', binary)
+
+
+def triggered_commands(trigger_source='BUS', volt_range=10, resolution=0.001):
+    """
+    Return the commands for one DC voltage reading per trigger.
+    trigger_source is 'BUS' for *TRG over USB or 'EXT' for the rear panel Ext Trig input.
+    """
+    return [f'CONF:VOLT:DC {volt_range},{resolution}',
+            f'TRIG:SOUR {trigger_source}',
+            'TRIG:DEL 0',  # measure as soon as the trigger arrives
+            'TRIG:COUN 1',
+            'SAMP:COUN 1']
+
+
+def trigger(pool, dmms, trigger_source='BUS'):
+    """
+    Arm every meter and fire a shared trigger, concurrently on the thread pool.
+    With 'EXT' the meters are only armed and wait for the external trigger line.
+    """
+    # Arm every meter before any trigger goes out so none of them can miss it
+    list(pool.map(lambda dmm: dmm.write('INIT'), dmms))
+    if trigger_source == 'BUS':
+        # Each meter gets its own *TRG, sent from parallel threads so they land together
+        list(pool.map(lambda dmm: dmm.write('*TRG'), dmms))
+
+
+def read_synchronized(pool, dmms, trigger_source='BUS', binary=False):
+    """
+    Arm every meter, fire a shared trigger and fetch all readings concurrently on the thread pool.
+    Returns one reading per meter, all taken on the same trigger.
+    """
+    trigger(pool, dmms, trigger_source)
+    # With 'EXT' the FETCH? waits for the external trigger line
+    return list(pool.map(lambda dmm: scpi_binary.query_readings(dmm, 'FETCH?', binary)[0], dmms))
+
+
+class DMM34465A(scpi_driver.Driver):
+    """
+    DC voltage of a 34465A with the setup of the fastest strategy in allowed built once.
+    single configures once and reads with READ?, which is what MEAS:VOLT:DC? does on every call
+    (MEASure? is CONFigure followed by READ?). volt_range applies to every strategy ('AUTO' autoranges like
+    MEAS:VOLT:DC?, buffered needs a fixed range), resolution to single and triggered ('DEF' for the default),
+    nplc and sample_interval to buffered.
+    """
+    def __init__(self, session, allowed=(), volt_range=10, resolution=0.001, nplc=0.02, sample_interval=0.001,
+                 trigger_source='BUS', binary=False, idn=None):
+        self.volt_range = volt_range
+        self.resolution = resolution
+        self.nplc = nplc
+        self.sample_interval = sample_interval
+        self.trigger_source = trigger_source
+        self.binary = binary
+        super().__init__(session, allowed, idn)
+
+    def compile(self, strategy):
+        if strategy == 'buffered':
+            commands = buffered_commands(self.nplc, self.sample_interval, volt_range=self.volt_range,
+                                         trigger_source=self.trigger_source)
+        elif strategy == 'triggered':
+            commands = triggered_commands(self.trigger_source, self.volt_range, self.resolution)
+        else:
+            commands = [f'CONF:VOLT:DC {self.volt_range},{self.resolution}']
+        return commands + (scpi_binary.binary_commands if self.binary else [])
+
+    def read(self):
+        """
+        Take one reading (single) and return it.
+        """
+        return scpi_binary.query_readings(self.session, 'READ?', self.binary)[0]
+
+    def start(self):
+        """
+        Arm the meter (buffered sampling then waits for its trigger, see trigger for starting several meters together).
+        """
+        self.session.write('INIT')
+
+    def stop(self):
+        self.session.write('ABOR')
+
+    def points(self):
+        return points(self.session)
+
+    def remove(self, count):
+        """
+        Remove the oldest count readings from reading memory (buffered) and return them as a NumPy array.
+        """
+        return remove_readings(self.session, count, self.binary)
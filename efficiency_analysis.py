@@ -0,0 +1,183 @@
+"""
+Efficiency analytics over the combined AC/DC CSV written by Combine_AC_DC.
+
+The combined file is loaded once into NumPy arrays, and everything after that
+is whole-array work: rolling efficiency from cumulative sums, load steps found
+from the DC power column, and per-step statistics with reduceat, so a
+million-row file takes seconds.
+
+Efficiency is DC Power / Total Power, the same ratio as the Efficiency column of the combined CSV.
+"""
+import csv
+
+import numpy as np
+
+from Combine_AC_DC import combine_header
+from timebase import dates_to_seconds, times_to_seconds
+
+# Combined CSV columns loaded for the analysis, by the names used in the arrays
+columns = {'p1': 'P1 (kW)', 'p2': 'P2 (kW)', 'p3': 'P3 (kW)', 'total_power': 'Total Power (kW)',
+           'dc_volt': 'DC Volt (V)', 'dc_current': 'DC Current (A)', 'dc_power': 'DC Power (W)'}
+
+# Quantities with full statistics in the step report, and the ones only averaged
+report_stats = {'efficiency': 'Efficiency', 'imbalance': 'Phase Imbalance',
+                'dc_volt': 'DC Volt (V)', 'dc_current': 'DC Current (A)', 'dc_power': 'DC Power (W)'}
+report_means = {'p1': 'P1 (kW)', 'p2': 'P2 (kW)', 'p3': 'P3 (kW)', 'total_power': 'Total Power (kW)'}
+
+
+def load_combined(combined_csv):
+    """
+    Read a combined CSV into a dict of NumPy arrays: 'time' (seconds from 1970-01-01),
+    'date' and 'clock' (the Date and Time strings) and one float array per columns entry.
+    Only the needed columns are parsed, by numpy's C reader.
+    """
+    with open(combined_csv, 'r') as file:
+        header = next(csv.reader(file))
+    index = {name: i for i, name in enumerate(header)}
+    missing = [name for name in ['Date', 'Time', *columns.values()] if name not in index]
+    if missing:
+        raise ValueError(f"{combined_csv} has no column {', '.join(missing)}")
+
+    stamps = np.loadtxt(combined_csv, dtype=str, delimiter=',', skiprows=1, ndmin=2,
+                        usecols=(index['Date'], index['Time']))
+    values = np.loadtxt(combined_csv, delimiter=',', skiprows=1, ndmin=2,
+                        usecols=[index[name] for name in columns.values()])
+
+    data = {'date': stamps[:, 0], 'clock': stamps[:, 1]}
+    data['time'] = dates_to_seconds(data['date']) + times_to_seconds(data['clock']) if len(stamps) else np.empty(0)
+    for j, key in enumerate(columns):
+        data[key] = values[:, j]
+    return data
+
+
+def efficiency(dc_power, total_power):
+    """
+    Row by row DC Power / Total Power, 0 where the total power is 0.
+    """
+    return np.divide(dc_power, total_power, out=np.zeros(len(dc_power)), where=total_power != 0)
+
+
+def rolling_efficiency(dc_power, total_power, window=60):
+    """
+    Efficiency over the last window rows: sum of DC power / sum of total power (energy weighted,
+    so a few rows near zero load do not dominate). The first window - 1 rows use the rows so far.
+    """
+    dc_sum = np.cumsum(dc_power)
+    total_sum = np.cumsum(total_power)
+    dc_sum[window:] -= dc_sum[:-window].copy()
+    total_sum[window:] -= total_sum[:-window].copy()
+    return efficiency(dc_sum, total_sum)
+
+
+def phase_imbalance(p1, p2, p3):
+    """
+    Row by row phase imbalance: largest deviation of a phase from the phase average, over the average.
+    """
+    phases = np.stack([p1, p2, p3])
+    average = phases.mean(axis=0)
+    deviation = np.abs(phases - average).max(axis=0)
+    return np.divide(deviation, np.abs(average), out=np.zeros(len(average)), where=average != 0)
+
+
+def segment_steps(dc_power, threshold=None, window=10, min_length=None):
+    """
+    Split the run into load steps from the DC power column. Returns the start row of every step (first is 0).
+
+    A step starts where the mean of the next window rows differs from the mean of the last
+    window rows by more than threshold (default 5% of the DC power range), at the row where
+    that difference peaks. Steps shorter than min_length rows (default 2 * window) are merged
+    into the neighbouring step with the bigger change.
+    """
+    n = len(dc_power)
+    if min_length is None:
+        min_length = 2 * window
+    if n < 2 * window:
+        return np.array([0])
+    if threshold is None:
+        threshold = 0.05 * (np.max(dc_power) - np.min(dc_power))
+
+    total = np.concatenate(([0.0], np.cumsum(dc_power)))
+    starts = np.arange(window, n - window + 1)
+    before = (total[starts] - total[starts - window]) / window
+    after = (total[starts + window] - total[starts]) / window
+    jump = np.abs(after - before)
+
+    # Peaks of the jump above the threshold (first row of a flat peak)
+    left = np.concatenate(([-np.inf], jump[:-1]))
+    right = np.concatenate((jump[1:], [-np.inf]))
+    peaks = np.flatnonzero((jump > threshold) & (jump > left) & (jump >= right))
+
+    # Only a handful of candidates are left, keep the biggest of any that are too close together
+    kept = []
+    for peak in peaks:
+        if kept and peak - kept[-1] < min_length:
+            if jump[peak] > jump[kept[-1]]:
+                kept[-1] = peak
+        else:
+            kept.append(peak)
+    boundaries = starts[kept]
+    boundaries = boundaries[(boundaries >= min_length) & (boundaries <= n - min_length)]
+    return np.concatenate(([0], boundaries)).astype(int)
+
+
+def step_stats(values, step_starts):
+    """
+    Per-step (mean, min, max, std) of values, one entry per step.
+    """
+    counts = np.diff(np.append(step_starts, len(values)))
+    mean = np.add.reduceat(values, step_starts) / counts
+    squares = np.add.reduceat((values - np.repeat(mean, counts)) ** 2, step_starts)
+    return mean, np.minimum.reduceat(values, step_starts), np.maximum.reduceat(values, step_starts), np.sqrt(squares / counts)
+
+
+def analyze(data, threshold=None, window=10, min_length=None, rolling_window=60):
+    """
+    Run the analytics over load_combined data. Adds 'efficiency', 'rolling_efficiency' and 'imbalance'
+    arrays to data and returns the step start rows.
+    """
+    data['efficiency'] = efficiency(data['dc_power'], data['total_power'])
+    data['rolling_efficiency'] = rolling_efficiency(data['dc_power'], data['total_power'], rolling_window)
+    data['imbalance'] = phase_imbalance(data['p1'], data['p2'], data['p3'])
+    return segment_steps(data['dc_power'], threshold, window, min_length)
+
+
+def report_header():
+    header = ['Step', 'Start Date', 'Start Time', 'End Time', 'Duration (s)', 'Rows']
+    for name in report_stats.values():
+        header += [f'{name} Mean', f'{name} Min', f'{name} Max', f'{name} Std']
+    header += [f'{name} Mean' for name in report_means.values()]
+    return header
+
+
+def write_report(data, step_starts, report_csv):
+    """
+    Write one row per load step. Returns the number of steps.
+    """
+    if len(data['time']) == 0:
+        step_starts = np.empty(0, dtype=int)
+    ends = np.append(step_starts[1:], len(data['time'])) - 1
+    stats = [step_stats(data[key], step_starts) for key in report_stats] if len(step_starts) else []
+    means = [np.add.reduceat(data[key], step_starts) / (ends - step_starts + 1) for key in report_means] if len(step_starts) else []
+
+    with open(report_csv, 'w', newline='') as file:
+        csvwriter = csv.writer(file)
+        csvwriter.writerow(report_header())
+        for i, (start, end) in enumerate(zip(step_starts, ends)):
+            row = [i + 1, data['date'][start], data['clock'][start], data['clock'][end],
+                   f"{data['time'][end] - data['time'][start]:.1f}", end - start + 1]
+            for stat in stats:
+                row += [f'{value[i]:.4f}' for value in stat]
+            row += [f'{mean[i]:.4f}' for mean in means]
+            csvwriter.writerow(row)
+    return len(step_starts)
+
+
+def write_rolling(data, rolling_csv):
+    """
+    Write Date, Time, Efficiency and Rolling Efficiency for every row of the combined data.
+    """
+    with open(rolling_csv, 'w', newline='') as file:
+        csvwriter = csv.writer(file)
+        csvwriter.writerow(['Date', 'Time', combine_header[-1], 'Rolling Efficiency'])
+        csvwriter.writerows(zip(data['date'], data['clock'],
+                                np.char.mod('%.4f', data['efficiency']), np.char.mod('%.4f', data['rolling_efficiency'])))
@@ -0,0 +1,96 @@
+"""
+Live plot renderer for the DAQ datalogger.
+
+The acquisition loop runs in its own thread and only puts samples on a queue.
+The renderer runs on the main thread (matplotlib needs the GUI there), drains
+the queue and redraws at a fixed frame rate. Only the data lines are redrawn,
+by blitting them over a saved background; the full figure (axes, ticks,
+legend) is only redrawn when the time axis has to grow.
+"""
+import queue
+import time
+
+
+class LivePlot:
+    """
+    Blitting renderer for one axes of lines, one line per channel name.
+
+    history is the ring_buffer.DecimatedHistory the samples are stored in
+    (one column per line, in lines order), so it can be plotted after the run.
+    """
+    def __init__(self, fig, ax, lines, history, fps=2):
+        self.fig = fig
+        self.ax = ax
+        self.lines = lines
+        self.history = history
+        self.frame_time = 1 / fps
+        self.background = None
+
+        # Lines are drawn by hand on every frame, not as part of the full figure draw
+        for line in self.lines.values():
+            line.set_animated(True)
+        # Grab a new background whenever the whole figure is redrawn (first show, resize, axis change)
+        self.fig.canvas.mpl_connect('draw_event', self._on_draw)
+
+    def _on_draw(self, event):
+        self.background = self.fig.canvas.copy_from_bbox(self.fig.bbox)
+        self._draw_lines()
+
+    def _draw_lines(self):
+        for line in self.lines.values():
+            self.ax.draw_artist(line)
+
+    def drain(self, sample_queue):
+        """
+        Move every waiting (time, values) sample from the queue into the history.
+        Returns the number of samples moved.
+        """
+        count = 0
+        while True:
+            try:
+                delta_time, values = sample_queue.get_nowait()
+            except queue.Empty:
+                return count
+            self.history.append(delta_time, values)
+            count += 1
+
+    def update(self):
+        """
+        Redraw the lines with the current data.
+        """
+        # The history holds a bounded number of points however long the run is
+        times, values = self.history.data()
+        for j, line in enumerate(self.lines.values()):
+            line.set_data(times, values[:, j])
+
+        # Grow the time axis in steps so a full redraw is only needed once in a while
+        x_min, x_max = self.ax.get_xlim()
+        if times[-1] > x_max or self.background is None:
+            self.ax.set_xlim(x_min, max(10, times[-1] * 1.25))
+            self.fig.canvas.draw()  # _on_draw saves the new background and draws the lines
+        else:
+            self.fig.canvas.restore_region(self.background)
+            self._draw_lines()
+        self.fig.canvas.blit(self.fig.bbox)
+
+    def run(self, sample_queue, is_done):
+        """
+        Render at the fixed frame rate until is_done() returns True and the queue is empty.
+        """
+        next_frame = time.monotonic()
+        while True:
+            done = is_done()  # checked before draining so the last samples still get drawn
+            if self.drain(sample_queue):
+                self.update()
+            if done:
+                return
+            self.fig.canvas.flush_events()  # keep the window responsive between frames
+            next_frame += self.frame_time
+            time.sleep(max(0.0, next_frame - time.monotonic()))
+
+    def finish(self):
+        """
+        Turn the lines back into normal artists so they are part of savefig and plt.show.
+        """
+        for line in self.lines.values():
+            line.set_animated(False)
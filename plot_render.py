@@ -0,0 +1,113 @@
+"""
+Temperature vs Time plot rendered from a finished (or running) DAQ log.
+
+The log is streamed in chunks, from the CSV or the binary log, into a
+ring_buffer.DecimatedHistory, so memory stays bounded however long the run
+was. The figure is drawn with the Agg backend directly (no pyplot, no GUI),
+and matplotlib is only imported when a plot is rendered. A headless logger
+never loads it during acquisition.
+"""
+import csv
+from itertools import islice
+
+import numpy as np
+
+import binary_log
+import ring_buffer
+from timebase import dates_to_seconds, times_to_seconds
+
+# Columns after the channels in the DAQ logs
+average_columns = ['Avg Temp (C)', 'Avg Temp (F)']
+
+
+def _channel_count(columns):
+    # Channels come first, anything after them (averages, Interval (s)) starts at the first average column
+    return columns.index(average_columns[0]) if average_columns[0] in columns else len(columns)
+
+
+def read_csv(csv_path, chunk_rows=100000):
+    """
+    Stream a DAQ CSV into a DecimatedHistory. Returns (channel names, history), times in minutes since the first row.
+    """
+    with open(csv_path, 'r') as file:
+        csvreader = csv.reader(file)
+        header = next(csvreader)
+        names = header[2:2 + _channel_count(header[2:])]
+        history = ring_buffer.DecimatedHistory(len(names))
+        start = None
+        while True:
+            rows = [row for row in islice(csvreader, chunk_rows) if len(row) == len(header)]
+            if not rows:
+                break
+            table = np.array(rows, dtype=str)
+            seconds = dates_to_seconds(table[:, 0]) + times_to_seconds(table[:, 1])
+            if start is None:
+                start = seconds[0]
+            values = table[:, 2:2 + len(names)].astype(float)
+            for t, row in zip((seconds - start) / 60, values):
+                history.append(t, row)
+    return names, history
+
+
+def read_log(log_path, chunk_rows=100000):
+    """
+    Stream a binary log into a DecimatedHistory. Returns (channel names, history), times in minutes since the first row.
+    """
+    columns, data = binary_log.open_log(log_path)
+    names = columns[1:1 + _channel_count(columns[1:])]
+    history = ring_buffer.DecimatedHistory(len(names))
+    for start in range(0, len(data), chunk_rows):
+        chunk = np.asarray(data[start:start + chunk_rows])
+        for t, row in zip((chunk[:, 0] - data[0, 0]) / 60, chunk[:, 1:1 + len(names)]):
+            history.append(t, row)
+    return names, history
+
+
+def save_plot(times, temps, names, png_filename, subtitle=None):
+    """
+    Draw the Temperature vs Time plot (same layout as the DAQ loggers) and save it as a PNG.
+    """
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+
+    fig = Figure(figsize=(12, 8))
+    FigureCanvasAgg(fig)
+    ax = fig.add_subplot()
+    for j, channel in enumerate(names):
+        ax.plot(times, temps[:, j], marker='o', label=f'Channel {channel}')
+
+    ax.set_ylim(20, 100)
+    ax.set_xlim(0, max(times))
+    ax.set_xticks(range(0, int(max(times)) + 1, 5))
+    ax.set_yticks(range(20, 100 + 1, 5))
+    ax.minorticks_on()
+    ax.grid(which='both', axis='y')
+    ax.grid(which='minor', axis='y', linestyle=':', linewidth=0.5)
+    ax.set_xlabel('Time (min)', fontsize=20)
+    ax.set_ylabel('Temperature (°C)', fontsize=20)
+    ax.set_title('Temperature vs Time', fontsize=26, pad=20 if subtitle else None)
+    if subtitle:
+        fig.text(0.43, 0.92, subtitle, ha='center', fontsize=14, color='grey')
+    for label in ax.get_xticklabels():
+        label.set_rotation(45)
+        label.set_horizontalalignment('right')
+    fig.tight_layout()
+    ax.grid(True)
+    ax.legend(loc='upper right', bbox_to_anchor=(1.27, 1), borderaxespad=0.)
+    fig.subplots_adjust(right=0.8)
+    fig.savefig(png_filename, format='png', bbox_inches='tight')
+
+
+def render(log_path, png_filename, subtitle=None):
+    """
+    Render the plot of a DAQ CSV or binary log (.actlog). Returns False if the log holds no data.
+    """
+    if log_path.endswith('.actlog'):
+        names, history = read_log(log_path)
+    else:
+        names, history = read_csv(log_path)
+    if not len(history):
+        return False
+    times, temps = history.data()
+    save_plot(times, temps, names, png_filename, subtitle)
+    return True
@@ -0,0 +1,118 @@
+"""
+Helpers for reading the three-phase power meter over VISA.
+
+The same quantities the power meter CSV export holds (V, A and P of each
+phase plus total power) are requested as one numeric list, so a full reading
+is a single query. Commands follow the Yokogawa WT numeric-list syntax.
+
+Poller reads the meter on its own thread next to another logger and joins
+its readings to the logger's sample times in memory, so efficiency is known
+while the test runs instead of after exporting and combining the CSVs.
+"""
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+import scpi_driver
+from timebase import asof_join
+
+# (function, element) of each numeric item, in the order they come back
+items = [('U', 1), ('I', 1), ('P', 1),
+         ('U', 2), ('I', 2), ('P', 2),
+         ('U', 3), ('I', 3), ('P', 3),
+         ('P', 'SIGMA')]
+
+# Columns of the items in the logger CSVs and the combined AC/DC CSV (Combine_AC_DC.combine_header)
+header = ['V1 (V)', 'A1 (A)', 'P1 (kW)', 'V2 (V)', 'A2 (A)', 'P2 (kW)', 'V3 (V)', 'A3 (A)', 'P3 (kW)', 'Total Power (kW)']
+
+# Power items come back in W, the export (and combined CSV) uses kW
+scale = np.array([1, 1, 0.001, 1, 1, 0.001, 1, 1, 0.001, 0.001])
+
+
+def configure(pm):
+    """
+    Set up the numeric item list once so every reading is one query.
+    """
+    commands = [':NUM:FORM ASC', f':NUM:NORM:NUM {len(items)}']
+    commands += [f':NUM:NORM:ITEM{i} {function},{element}' for i, (function, element) in enumerate(items, start=1)]
+    pm.write(scpi_driver.join_commands(commands))  # one write for the whole item list
+
+
+def read(pm):
+    """
+    Return one reading of every item as a NumPy array in items order (V, A, kW).
+    """
+    return np.array(pm.query(':NUM:NORM:VAL?').split(','), dtype=float) * scale
+
+
+def efficiency(dc_power, total_power):
+    """
+    DC power / total power (both kW), 0 where the total power is 0. Works on numbers and arrays.
+    """
+    return np.divide(dc_power, total_power, out=np.zeros(np.shape(dc_power)), where=np.asarray(total_power) != 0)
+
+
+class Poller:
+    """
+    Reads the power meter every interval seconds on a background thread and keeps the
+    last history seconds of (epoch time, reading) for joining to other instruments.
+    A failed reading (a timeout) is counted in errors and polling goes on, the times
+    it leaves without a reading come out unmatched from join.
+    """
+    def __init__(self, pm, interval=0.5, history=60.0):
+        self.pm = pm
+        self.interval = interval
+        self.readings = deque(maxlen=max(2, int(history / interval)))
+        self.lock = threading.Lock()
+        self.stopping = threading.Event()
+        self.errors = 0
+        self.thread = threading.Thread(target=self._run, daemon=True)
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def start(self):
+        self.thread.start()
+
+    def stop(self):
+        self.stopping.set()
+        if self.thread.is_alive():
+            self.thread.join()
+
+    def _run(self):
+        while not self.stopping.is_set():
+            started = time.time()
+            try:
+                values = read(self.pm)
+            except Exception as e:
+                self.errors += 1
+                print(f"Power meter error: {e}")
+            else:
+                # Stamp the reading halfway through the query
+                with self.lock:
+                    self.readings.append(((started + time.time()) / 2, values))
+            self.stopping.wait(max(0.0, self.interval - (time.time() - started)))
+
+    def join(self, times, tolerance=1.0, interpolate=False):
+        """
+        Power meter values for every epoch time in times (same method as Combine_AC_DC.combine_asof).
+        Returns (values, matched): one row of items per time, NaN where no reading was within tolerance seconds.
+        """
+        times = np.atleast_1d(np.asarray(times, dtype=float))
+        with self.lock:
+            readings = list(self.readings)
+        if not readings:
+            return np.full((len(times), len(items)), np.nan), np.zeros(len(times), dtype=bool)
+
+        pm_times = np.array([reading[0] for reading in readings])
+        pm_values = np.array([reading[1] for reading in readings])
+        left, right, weight, matched = asof_join(pm_times, times, tolerance, interpolate)
+        values = pm_values[left] * (1 - weight[:, np.newaxis]) + pm_values[right] * weight[:, np.newaxis]
+        values[~matched] = np.nan
+        return values, matched
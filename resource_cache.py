@@ -0,0 +1,150 @@
+"""
+Instrument discovery cache.
+
+rm.list_resources() enumerates every USB, GPIB and serial port on the PC and
+is slow on a full bench, while the scripts already know which instrument
+they want. Discovery.open opens the address remembered for the
+instrument's serial number (or the script's own resource string the first
+time), checks it with *IDN? and only when that fails enumerates the bench to
+find where the instrument went. The bench is enumerated at most once per
+Discovery, every instrument opened after that is looked up in the same
+result; what it finds is saved for the next run.
+
+The cache is a small JSON file. USB instruments are stored under the serial
+number in their resource string, other interfaces (GPIB, TCPIP) under the
+script's resource string together with the serial their *IDN? reported, so
+they can be found by that serial if they move:
+    {"MY54507560": {"address": "USB0::...", "serial": "MY54507560"},
+     "GPIB0::5::INSTR": {"address": "GPIB0::7::INSTR", "serial": "91K123456"}}
+"""
+import json
+import os
+
+import pyvisa
+
+cache_path = os.path.join(os.path.expanduser('~'), '.act_visa_resources.json')
+
+
+def serial_of(resource_string):
+    """
+    Serial number in a USB resource string (USB0::vendor::product::serial::...), None for other interfaces.
+    """
+    parts = resource_string.split('::')
+    if parts[0].upper().startswith('USB') and len(parts) > 3:
+        return parts[3]
+    return None
+
+
+def idn_serial(idn):
+    """
+    Serial number field of an *IDN? reply (manufacturer,model,serial,firmware), None if there is none.
+    """
+    fields = idn.split(',')
+    return fields[2].strip() if len(fields) > 2 else None
+
+
+def load_cache(path=cache_path):
+    try:
+        with open(path) as file:
+            cache = json.load(file)
+    except (OSError, ValueError):
+        return {}
+    # Caches written before entries carried the serial held only the address
+    return {key: entry if isinstance(entry, dict) else {'address': entry, 'serial': serial_of(entry)}
+            for key, entry in cache.items()}
+
+
+def save_cache(cache, path=cache_path):
+    try:
+        temporary = f'{path}.tmp'
+        with open(temporary, 'w') as file:
+            json.dump(cache, file, indent=2)
+        os.replace(temporary, path)
+    except OSError as e:
+        print(f"Could not save the resource cache: {e}")
+
+
+class Discovery:
+    """
+    Opens instruments by serial number through the cache, with at most one bench enumeration per run.
+    """
+    def __init__(self, rm, path=cache_path, probe_timeout=500):
+        self.rm = rm
+        self.path = path
+        self.probe_timeout = probe_timeout  # ms for the *IDN? of each resource during a rescan
+        self.cache = load_cache(path)
+        self.scanned = False
+        self.found = {}  # serial number -> resource string, filled by rescan
+        self.idns = {}  # resource string given to open -> *IDN? reply of the instrument opened for it
+
+    def _try(self, address, serial, timeout):
+        """
+        Open address and return (session, idn) if the instrument there answers *IDN? with serial (any if None), else None.
+        """
+        try:
+            session = self.rm.open_resource(address)
+        except Exception:
+            return None
+        try:
+            session.timeout = timeout
+            idn = session.query('*IDN?').strip()
+            if serial is None or serial in idn:
+                return session, idn
+        except Exception:
+            pass
+        session.close()
+        return None
+
+    def rescan(self):
+        """
+        Enumerate the bench into self.found (once, later calls reuse the result).
+        """
+        if self.scanned:
+            return
+        self.scanned = True
+        print('Instrument not found at its cached address, scanning the bench...')
+        # Resource strings that carry their serial number are known without talking to them
+        for address in self.rm.list_resources():
+            serial = serial_of(address)
+            if serial is not None:
+                self.found[serial] = address
+                continue
+            if address.upper().startswith('ASRL'):
+                continue  # serial ports are not probed, an *IDN? can upset whatever listens there
+            result = self._try(address, None, self.probe_timeout)
+            if result is not None:
+                session, idn = result
+                session.close()
+                serial = idn_serial(idn)
+                if serial:
+                    self.found[serial] = address
+
+    def open(self, resource_string, timeout=10000):
+        """
+        Open the instrument of resource_string (found by its serial number if it moved) and return the session.
+        Raises pyvisa.VisaIOError (resource not found) if it is not on the bench.
+        """
+        key = serial_of(resource_string) or resource_string
+        entry = self.cache.get(key, {})
+        address = entry.get('address', resource_string)
+        # Serial the instrument has to report: from a USB resource string, else the one cached the first time
+        # it was opened (None the very first time, then whatever answers at the address is taken)
+        serial = serial_of(resource_string) or entry.get('serial')
+        result = self._try(address, serial, timeout)
+        if result is None and address != resource_string:
+            result = self._try(resource_string, serial, timeout)
+        if result is None and serial is not None:
+            self.rescan()
+            new_address = self.found.get(serial)
+            if new_address is not None and new_address not in (address, resource_string):
+                result = self._try(new_address, serial, timeout)
+        if result is None:
+            raise pyvisa.errors.VisaIOError(pyvisa.constants.StatusCode.error_resource_not_found)
+
+        session, idn = result
+        self.idns[resource_string] = idn
+        new_entry = {'address': session.resource_name, 'serial': serial or idn_serial(idn)}
+        if self.cache.get(key) != new_entry:
+            self.cache[key] = new_entry
+            save_cache(self.cache, self.path)
+        return session
@@ -0,0 +1,151 @@
+"""
+Fixed-memory sample storage for long-running logs.
+
+RingBuffer is a preallocated NumPy array that keeps the newest rows.
+DecimatedHistory chains a few of them: the newest samples are kept at full
+resolution, and every time a level fills up its oldest block is reduced to
+its per-channel min and max and moved to the next (coarser) level. The last
+level reduces itself in place, so the whole run stays covered (at lower and
+lower resolution) in a memory size fixed at startup. Min/max reduction keeps
+the peaks, which is what matters on a temperature plot.
+"""
+import numpy as np
+
+
+class RingBuffer:
+    """
+    Preallocated circular buffer of rows with a fixed number of columns.
+    """
+    def __init__(self, capacity, n_columns):
+        self.data = np.empty((capacity, n_columns))
+        self.capacity = capacity
+        self.start = 0  # index of the oldest row
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    def full(self):
+        return self.count == self.capacity
+
+    def append(self, row):
+        """
+        Add a row, overwriting the oldest one when the buffer is full.
+        """
+        self.data[(self.start + self.count) % self.capacity] = row
+        if self.count < self.capacity:
+            self.count += 1
+        else:
+            self.start = (self.start + 1) % self.capacity
+
+    def oldest(self, n):
+        """
+        Return a copy of the n oldest rows, oldest first.
+        """
+        index = (self.start + np.arange(min(n, self.count))) % self.capacity
+        return self.data[index]
+
+    def drop_oldest(self, n):
+        n = min(n, self.count)
+        self.start = (self.start + n) % self.capacity
+        self.count -= n
+
+    def rows(self):
+        """
+        Return a copy of every row, oldest first.
+        """
+        return self.oldest(self.count)
+
+
+def min_max_reduce(block):
+    """
+    Reduce a block of rows (column 0 is time) to two rows holding each channel's min and max.
+
+    For every channel the two values are kept in the order they happened, so a
+    rising edge stays rising. The two rows get the block's first and last time.
+    """
+    i_min = block[:, 1:].argmin(axis=0)
+    i_max = block[:, 1:].argmax(axis=0)
+    columns = np.arange(block.shape[1] - 1)
+    v_min = block[i_min, columns + 1]
+    v_max = block[i_max, columns + 1]
+    min_first = i_min <= i_max
+    reduced = np.empty((2, block.shape[1]))
+    reduced[0, 0] = block[0, 0]
+    reduced[1, 0] = block[-1, 0]
+    reduced[0, 1:] = np.where(min_first, v_min, v_max)
+    reduced[1, 1:] = np.where(min_first, v_max, v_min)
+    return reduced
+
+
+class DecimatedHistory:
+    """
+    Full-resolution recent window plus progressively decimated history.
+
+    n_channels values are stored per sample along with its time.
+    Memory is levels * capacity rows. Every level reduces blocks of block rows
+    to 2, so each level is block / 2 times coarser than the one before it.
+    """
+    def __init__(self, n_channels, capacity=3600, levels=4, block=20):
+        self.levels = [RingBuffer(capacity, n_channels + 1) for _ in range(levels)]
+        self.block = block
+        # Rows waiting to be reduced into the last level, and how many make up one reduced pair
+        self.pending = []
+        self.pending_size = 2
+
+    def __len__(self):
+        return sum(len(level) for level in self.levels)
+
+    def append(self, t, values):
+        """
+        Add one sample (time and one value per channel).
+        """
+        row = np.empty(self.levels[0].data.shape[1])
+        row[0] = t
+        row[1:] = values
+        self._push(0, row[np.newaxis])
+
+    def _push(self, k, rows):
+        if k == len(self.levels) - 1:
+            self._push_last(rows)
+            return
+        level = self.levels[k]
+        for row in rows:
+            if level.full():
+                # Move the oldest block, reduced to a min/max pair, to the next level
+                self._push(k + 1, min_max_reduce(level.oldest(self.block)))
+                level.drop_oldest(self.block)
+            level.append(row)
+
+    def _push_last(self, rows):
+        level = self.levels[-1]
+        self.pending.extend(rows)
+        if len(self.pending) < self.pending_size:
+            return
+        block = np.array(self.pending)
+        self.pending = []
+        if len(block) > 2:
+            block = min_max_reduce(block)
+        if level.full():
+            # Halve the resolution of the whole level, and of everything added to it from now on
+            kept = level.rows()
+            level.drop_oldest(level.count)
+            for i in range(0, len(kept), 4):
+                for row in min_max_reduce(kept[i:i + 4]):
+                    level.append(row)
+            self.pending_size *= 2
+        for row in block:
+            level.append(row)
+
+    def data(self):
+        """
+        Return (times, values) of every stored sample, oldest first.
+        values has one column per channel.
+        """
+        pending = np.array(self.pending).reshape(-1, self.levels[0].data.shape[1])
+        rows = np.concatenate([self.levels[-1].rows(), pending] + [level.rows() for level in reversed(self.levels[:-1])])
+        return rows[:, 0], rows[:, 1:]
+
+    def last_time(self):
+        level = self.levels[0]
+        return level.data[(level.start + level.count - 1) % level.capacity, 0]
@@ -0,0 +1,133 @@
+"""
+Running statistics of every logged channel, without keeping the history.
+
+RunningStats keeps count, min, max, mean and variance (Welford's algorithm,
+with chunks merged the parallel way, so a buffered chunk costs one NumPy pass)
+of every column, the time of each column's peak and, given an ambient
+channel, the rise of every channel over ambient (latest and highest). Memory
+is a few numbers per channel however long the run is. Non-finite readings
+are left out.
+
+At the end of a run report() prints the summary and writes it as a CSV,
+one row per channel.
+"""
+import csv
+
+import numpy as np
+
+summary_header = ['Channel', 'Count', 'Min', 'Max', 'Mean', 'Std', 'Peak Time (min)', 'Rise', 'Max Rise']
+
+
+class RunningStats:
+    """
+    Running statistics of the columns in names. ambient is the name of the column the rise is measured over
+    (None for no rise). Times are seconds since the start of the run.
+    """
+    def __init__(self, names, ambient=None):
+        self.names = list(names)
+        self.ambient = self.names.index(ambient) if ambient is not None else None
+        columns = len(self.names)
+        self.count = np.zeros(columns, dtype=int)
+        self.mean = np.zeros(columns)
+        self.m2 = np.zeros(columns)  # sum of squared deviations from the mean
+        self.minimum = np.full(columns, np.inf)
+        self.maximum = np.full(columns, -np.inf)
+        self.peak_time = np.full(columns, np.nan)
+        self.rise = np.full(columns, np.nan)
+        self.max_rise = np.full(columns, -np.inf)
+
+    def update(self, t, values):
+        """
+        Add one row (a sweep or one reading of every quantity) taken t seconds into the run.
+        """
+        self.update_many([t], [values])
+
+    def update_many(self, times, rows):
+        """
+        Add a chunk of rows, rows[i] taken times[i] seconds into the run.
+        """
+        times = np.asarray(times, dtype=float)
+        rows = np.asarray(rows, dtype=float).reshape(len(times), len(self.names))
+        valid = np.isfinite(rows)
+        count = valid.sum(axis=0)
+        seen = count > 0
+
+        # Mean and squared deviations of the chunk, merged into the running ones (Chan et al.)
+        chunk_mean = np.where(valid, rows, 0).sum(axis=0) / np.maximum(count, 1)
+        chunk_m2 = np.where(valid, (rows - chunk_mean) ** 2, 0).sum(axis=0)
+        total = self.count + count
+        delta = chunk_mean - self.mean
+        self.mean = np.where(seen, self.mean + delta * count / np.maximum(total, 1), self.mean)
+        self.m2 = np.where(seen, self.m2 + chunk_m2 + delta ** 2 * self.count * count / np.maximum(total, 1), self.m2)
+        self.count = total
+
+        self.minimum = np.minimum(self.minimum, np.where(valid, rows, np.inf).min(axis=0))
+        highest = np.where(valid, rows, -np.inf)
+        peak = highest.argmax(axis=0)
+        chunk_max = highest[peak, np.arange(len(self.names))]
+        new_peak = chunk_max > self.maximum
+        self.peak_time[new_peak] = times[peak[new_peak]]
+        self.maximum = np.maximum(self.maximum, chunk_max)
+
+        if self.ambient is not None:
+            rise = rows - rows[:, self.ambient:self.ambient + 1]
+            self.rise = np.where(np.isfinite(rise[-1]), rise[-1], self.rise)
+            self.max_rise = np.maximum(self.max_rise, np.where(np.isfinite(rise), rise, -np.inf).max(axis=0))
+
+    def std(self):
+        """
+        Sample standard deviation of every column (NaN below two readings).
+        """
+        return np.sqrt(np.where(self.count > 1, self.m2 / np.maximum(self.count - 1, 1), np.nan))
+
+    def rows(self):
+        """
+        Summary rows, one per column, in summary_header order. Empty cells where there is no value.
+        """
+        def cell(value):
+            return f'{value:.6f}' if np.isfinite(value) else ''
+
+        std = self.std()
+        result = []
+        for j, name in enumerate(self.names):
+            seen = self.count[j] > 0
+            row = [name, int(self.count[j])]
+            row += [cell(value) if seen else '' for value in (self.minimum[j], self.maximum[j], self.mean[j], std[j])]
+            row += [cell(self.peak_time[j] / 60)]
+            if self.ambient is None or j == self.ambient:
+                row += ['', '']
+            else:
+                row += [cell(self.rise[j]), cell(self.max_rise[j])]
+            result.append(row)
+        return result
+
+    def table(self):
+        """
+        The summary as text for the console.
+        """
+        lines = [f'{summary_header[0]:<20}{summary_header[1]:>8}' + ''.join(f'{field:>16}' for field in summary_header[2:])]
+        for row in self.rows():
+            lines.append(f'{row[0][:19]:<20}{row[1]:>8}' + ''.join(f'{value[:15]:>16}' for value in row[2:]))
+        return '\n'.join(lines)
+
+    def write(self, path):
+        """
+        Write the summary as a CSV file.
+        """
+        with open(path, 'w', newline='') as file:
+            csvwriter = csv.writer(file)
+            csvwriter.writerow(summary_header)
+            csvwriter.writerows(self.rows())
+
+    def report(self, path):
+        """
+        Print the summary and write it to path. Returns False (and does neither) if nothing was recorded.
+        """
+        if not self.count.any():
+            return False
+        print('')
+        print('Statistics:')
+        print(self.table())
+        self.write(path)
+        print(f'Summary saved as {path}')
+        return True
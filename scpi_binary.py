@@ -0,0 +1,23 @@
+"""
+Binary reading transfer for the Keysight DAQ973A and 34465A.
+
+With FORM:DATA REAL,64 the instruments send readings as an IEEE 488.2 block of
+big-endian float64 values (#<n><length><bytes>) instead of comma separated
+text. A block is decoded straight into a NumPy array, which saves both bus
+bytes and the per-value float() parsing on multi-channel and multi-sample reads.
+"""
+import numpy as np
+
+# Setup commands for binary float64 output of READ?, FETCH? and DATA:REMove?, sent with the rest of a driver's setup.
+# FORM:BORD NORM is big-endian, matching is_big_endian in query_readings
+binary_commands = ['FORM:DATA REAL,64', 'FORM:BORD NORM']
+
+
+def query_readings(inst, command, binary=False):
+    """
+    Send a reading query (READ?, FETCH?, DATA:REM? ...) and return every reading as a NumPy array.
+    binary must match the FORM:DATA setting of the instrument.
+    """
+    if binary:
+        return inst.query_binary_values(command, datatype='d', is_big_endian=True, container=np.array)
+    return np.array(inst.query(command).split(','), dtype=float)
@@ -0,0 +1,110 @@
+"""
+Driver layer shared by the DAQ973A and 34465A drivers (daq973a.DAQ973A, dmm34465a.DMM34465A).
+
+A driver builds the setup and read commands of its instrument once, when it
+is created, instead of the scripts formatting them again on every call. The
+setup goes out as a single ';'-joined program message, so configuring an
+instrument is one write instead of one per command and channel.
+
+Reads use the fastest strategy the instrument supports, looked up by the model
+in its *IDN? reply in the capability table below, out of the strategies the
+script allows (a script that wants one reading per loop does not allow
+buffered). 'single' is always allowed and every instrument supports it.
+"""
+import abc
+
+# Read strategies, fastest first:
+#   scan       one READ? returns a sweep of every channel (DAQ)
+#   buffered   the meter samples on its own timer into reading memory, drained with DATA:REMove? (DMM)
+#   triggered  one reading per trigger, so several meters can read on the same trigger (DMM)
+#   single     one query per reading and channel
+strategies = ['scan', 'buffered', 'triggered', 'single']
+
+# Read strategies each model supports
+capabilities = {
+    'DAQ970A': ['scan', 'single'],
+    'DAQ973A': ['scan', 'single'],
+    '34465A': ['buffered', 'triggered', 'single'],
+    '34470A': ['buffered', 'triggered', 'single'],
+    '34461A': ['triggered', 'single'],
+}
+# Models missing from the table only get the strategy every instrument has
+fallback = ['single']
+
+
+def join_commands(commands):
+    """
+    Join commands into one program message.
+    Every command after the first starts with ':' so it is read from the root of the command tree,
+    not from the subsystem of the command before it (common commands such as *TRG need no ':').
+    """
+    return ';'.join(command if i == 0 or command.startswith((':', '*')) else f':{command}'
+                    for i, command in enumerate(commands))
+
+
+def model_of(idn):
+    """
+    Model in an *IDN? reply (manufacturer,model,serial,firmware), '' if there is none.
+    """
+    fields = idn.split(',')
+    return fields[1].strip().upper() if len(fields) > 1 else ''
+
+
+def fastest(drivers, allowed=()):
+    """
+    Fastest strategy in allowed that the instruments of every driver support, 'single' if there is none.
+    """
+    for strategy in strategies:
+        if strategy in allowed and all(driver.supports(strategy) for driver in drivers):
+            return strategy
+    return 'single'
+
+
+def use_fastest(drivers, allowed=()):
+    """
+    Switch every driver to the fastest strategy they all support (meters that are read together
+    have to read the same way) and return it.
+    """
+    strategy = fastest(drivers, allowed)
+    for driver in drivers:
+        driver.use(strategy)
+    return strategy
+
+
+class Driver(abc.ABC):
+    """
+    An instrument session with the commands of its read strategy built ahead of time.
+    Subclasses set their own settings before calling Driver.__init__ and return the setup commands
+    of a strategy from compile(strategy), building their read commands on the way.
+    idn is the instrument's *IDN? reply when the caller already has it (resource_cache.Discovery.idns),
+    otherwise it is queried.
+    """
+    def __init__(self, session, allowed=(), idn=None):
+        self.session = session
+        self.idn = idn if idn is not None else session.query('*IDN?').strip()
+        self.model = model_of(self.idn)
+        self.use(fastest([self], allowed))
+
+    def supports(self, strategy):
+        return strategy in capabilities.get(self.model, fallback)
+
+    def use(self, strategy):
+        """
+        Build the setup and read commands of strategy (sent by configure).
+        """
+        if not self.supports(strategy):
+            raise ValueError(f"{self.model or 'Instrument'} does not support the {strategy} strategy")
+        self.strategy = strategy
+        self.setup = join_commands(self.compile(strategy))
+
+    @abc.abstractmethod
+    def compile(self, strategy):
+        """
+        Return the setup commands of strategy.
+        """
+
+    def configure(self):
+        """
+        Send the whole setup in one write.
+        """
+        self.session.write(self.setup)
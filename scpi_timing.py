@@ -0,0 +1,231 @@
+"""
+Per-command timing of the instrument sessions.
+
+instrument(rm) wraps a (pyvisa or simulated) resource manager so every session
+it opens records how long each write and query takes, keyed by SCPI command
+(arguments and channel lists left out, so MEAS:TEMP? of every channel is one
+entry). Timeouts are counted per command and queries can be retried after a
+timeout. Durations go into log-spaced histograms (10 bins per decade, 10 µs
+to 100 s), so memory stays fixed however long the run is.
+
+At exit a summary table is printed (and written to summary_path). With
+export_path a JSON snapshot of all histograms is rewritten every
+export_interval seconds while the run is going, for watching a run live.
+"""
+import atexit
+import json
+import os
+import threading
+import time
+
+import numpy as np
+import pyvisa
+
+# Histogram bin edges in seconds: 10 µs to 100 s, 10 bins per decade (plus under and overflow bins)
+bin_edges = np.logspace(-5, 2, 71)
+
+
+def command_key(command):
+    """
+    Command without its arguments, e.g. 'MEAS:TEMP? TC,J,(@101)' -> 'MEAS:TEMP?'.
+    ';' joined commands keep every header: 'CONF:TEMP ...;UNIT:TEMP ...' -> 'CONF:TEMP;UNIT:TEMP'.
+    """
+    return ';'.join(part.split()[0].upper() for part in command.split(';') if part.strip())
+
+
+def is_timeout(error):
+    return isinstance(error, pyvisa.VisaIOError) and error.error_code == pyvisa.constants.StatusCode.error_timeout
+
+
+class CommandStats:
+    """
+    Timing of one command: count, total, min, max and a histogram of the durations, plus timeouts and retries.
+    """
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.minimum = float('inf')
+        self.maximum = 0.0
+        self.histogram = np.zeros(len(bin_edges) + 1, dtype=int)
+        self.timeouts = 0
+        self.retries = 0
+        self.errors = 0
+
+    def add(self, seconds):
+        self.count += 1
+        self.total += seconds
+        self.minimum = min(self.minimum, seconds)
+        self.maximum = max(self.maximum, seconds)
+        self.histogram[np.searchsorted(bin_edges, seconds, side='right')] += 1
+
+    def percentile(self, q):
+        """
+        Upper bin edge below which q percent of the durations fall (an estimate, good to one bin, never above the max).
+        """
+        if self.count == 0:
+            return float('nan')
+        index = int(np.searchsorted(np.cumsum(self.histogram), q / 100 * self.count))
+        return min(float(bin_edges[index]), self.maximum) if index < len(bin_edges) else self.maximum
+
+    def snapshot(self):
+        return {'count': self.count, 'total_s': self.total,
+                'mean_s': self.total / self.count if self.count else None,
+                'min_s': self.minimum if self.count else None, 'max_s': self.maximum,
+                'p50_s': self.percentile(50), 'p90_s': self.percentile(90), 'p99_s': self.percentile(99),
+                'timeouts': self.timeouts, 'retries': self.retries, 'errors': self.errors,
+                'histogram': self.histogram.tolist()}
+
+
+class Recorder:
+    """
+    Command timings of every session of a run, shared between threads.
+    """
+    def __init__(self):
+        self.stats = {}
+        self.lock = threading.Lock()
+        self.started = time.time()
+
+    def _stats(self, key):
+        stats = self.stats.get(key)
+        if stats is None:
+            stats = self.stats[key] = CommandStats()
+        return stats
+
+    def add(self, key, seconds):
+        with self.lock:
+            self._stats(key).add(seconds)
+
+    def count(self, key, field):
+        with self.lock:
+            stats = self._stats(key)
+            setattr(stats, field, getattr(stats, field) + 1)
+
+    def snapshot(self):
+        with self.lock:
+            return {'started': self.started, 'elapsed_s': time.time() - self.started, 'bin_edges_s': bin_edges.tolist(),
+                    'commands': {key: stats.snapshot() for key, stats in self.stats.items()}}
+
+    def summary(self):
+        """
+        Table of every command, slowest total time first.
+        """
+        with self.lock:
+            rows = sorted(self.stats.items(), key=lambda item: item[1].total, reverse=True)
+            lines = [f"{'Command':<28}{'Count':>9}{'Total s':>10}{'Mean ms':>10}{'p50 ms':>9}{'p90 ms':>9}"
+                     f"{'p99 ms':>9}{'Max ms':>9}{'Timeouts':>10}{'Retries':>9}"]
+            for key, stats in rows:
+                mean = stats.total / stats.count * 1000 if stats.count else float('nan')
+                lines.append(f'{key[:27]:<28}{stats.count:>9}{stats.total:>10.2f}{mean:>10.3f}'
+                             f'{stats.percentile(50) * 1000:>9.3f}{stats.percentile(90) * 1000:>9.3f}'
+                             f'{stats.percentile(99) * 1000:>9.3f}{stats.maximum * 1000:>9.3f}'
+                             f'{stats.timeouts:>10}{stats.retries:>9}')
+        return '\n'.join(lines)
+
+    def export(self, path):
+        """
+        Write a JSON snapshot, replacing the file in one step so a reader never sees half of it.
+        """
+        temporary = f'{path}.tmp'
+        with open(temporary, 'w') as file:
+            json.dump(self.snapshot(), file)
+        os.replace(temporary, path)
+
+
+class InstrumentedSession:
+    """
+    Wraps an instrument session and times write, query, query_binary_values and read.
+    A query that times out is retried up to retries times (after clearing the session).
+    Everything else is passed through to the session.
+    """
+    def __init__(self, session, recorder, retries=0):
+        object.__setattr__(self, 'session', session)
+        object.__setattr__(self, 'recorder', recorder)
+        object.__setattr__(self, 'retries', retries)
+        object.__setattr__(self, 'last_key', None)
+
+    def __getattr__(self, name):
+        return getattr(self.session, name)
+
+    def __setattr__(self, name, value):
+        setattr(self.session, name, value)  # e.g. daq.timeout = 10000 sets the real session's timeout
+
+    def _call(self, key, retries, function, *args, **kwargs):
+        object.__setattr__(self, 'last_key', key)
+        for attempt in range(retries + 1):
+            started = time.perf_counter()
+            try:
+                result = function(*args, **kwargs)
+            except Exception as e:
+                if is_timeout(e):
+                    self.recorder.count(key, 'timeouts')
+                    if attempt < retries:
+                        self.recorder.count(key, 'retries')
+                        clear = getattr(self.session, 'clear', None)
+                        if clear is not None:
+                            clear()
+                        continue
+                else:
+                    self.recorder.count(key, 'errors')
+                raise
+            self.recorder.add(key, time.perf_counter() - started)
+            return result
+
+    def write(self, command, *args, **kwargs):
+        # Writes are never repeated, a second INIT or *TRG would change what the instrument does
+        return self._call(command_key(command), 0, self.session.write, command, *args, **kwargs)
+
+    def query(self, command, *args, **kwargs):
+        return self._call(command_key(command), self.retries, self.session.query, command, *args, **kwargs)
+
+    def query_binary_values(self, command, *args, **kwargs):
+        return self._call(command_key(command), self.retries, self.session.query_binary_values, command, *args, **kwargs)
+
+    def read(self, *args, **kwargs):
+        # A read belongs to the last command written
+        return self._call(f'{self.last_key} (read)', self.retries, self.session.read, *args, **kwargs)
+
+
+class InstrumentedResourceManager:
+    """
+    Wraps a resource manager so every session it opens is an InstrumentedSession sharing one Recorder.
+    """
+    def __init__(self, rm, recorder=None, retries=0):
+        self.rm = rm
+        self.recorder = recorder or Recorder()
+        self.retries = retries
+
+    def __getattr__(self, name):
+        return getattr(self.rm, name)
+
+    def open_resource(self, resource_name, *args, **kwargs):
+        return InstrumentedSession(self.rm.open_resource(resource_name, *args, **kwargs), self.recorder, self.retries)
+
+
+def _export_loop(recorder, path, interval):
+    while True:
+        time.sleep(interval)
+        recorder.export(path)
+
+
+def _finish(recorder, summary_path, export_path):
+    print('')
+    print('SCPI command timing:')
+    print(recorder.summary())
+    if summary_path:
+        with open(summary_path, 'w') as file:
+            file.write(recorder.summary() + '\n')
+    if export_path:
+        recorder.export(export_path)
+
+
+def instrument(rm, retries=0, summary_path=None, export_path=None, export_interval=5.0):
+    """
+    Return rm wrapped so every session opened from it is timed per command.
+    The summary is printed (and written to summary_path) when the script exits; with export_path a JSON
+    snapshot is rewritten every export_interval seconds during the run.
+    """
+    instrumented = InstrumentedResourceManager(rm, retries=retries)
+    if export_path:
+        threading.Thread(target=_export_loop, args=(instrumented.recorder, export_path, export_interval), daemon=True).start()
+    atexit.register(_finish, instrumented.recorder, summary_path, export_path)
+    return instrumented
@@ -0,0 +1,328 @@
+"""
+Simulated bench for running the dataloggers without instruments.
+
+ResourceManager stands in for pyvisa.ResourceManager: open_resource returns a
+simulated DAQ973A, 34465A or power meter (picked from the USB product id in
+the resource string, so the scripts' own resource strings work unchanged).
+They answer the SCPI commands the scripts use (*IDN?, CONF/UNIT, MEAS:TEMP?,
+MEAS:VOLT:DC?, INIT, READ?, FETCH?, scan lists, buffered sampling, binary
+transfer and the power meter numeric list) with synthetic signals:
+
+    DAQ973A      every channel warms up from ambient along its own first order curve, plus noise
+    34465A       DC voltage that follows a staircase load profile, plus noise
+    power meter  three-phase readings whose total is the DC power over efficiency
+
+Every query waits latency seconds, plus reading_time per reading taken, so
+throughput can be measured the same way as on the bench. speed runs the
+synthetic signals faster than real time (e.g. speed=60 is a minute of
+warm up or load profile per second).
+"""
+import struct
+import time
+
+import numpy as np
+import pyvisa
+
+# USB product ids in the resource strings
+DAQ973A = 0x8601
+DMM34465A = 0x0301
+POWER_METER = 0x0025
+
+# Default resources listed by list_resources (the ones the scripts use)
+default_resources = ('USB0::10893::34305::MY59007195::0::INSTR',
+                     'USB0::0x2A8D::0x0301::MY54507560::INSTR',
+                     'USB0::0x2A8D::0x0301::MY54505907::INSTR',
+                     'USB0::0x0B21::0x0025::XXXXXXXXX::INSTR')
+
+ambient = 25.0  # °C
+load_steps = [0.25, 0.5, 0.75, 1.0, 0.5]  # fraction of full load, repeated
+step_time = 60.0  # seconds per load step
+full_load_current = 100.0  # A
+dc_voltage = 5.0  # V
+efficiency = 0.9
+
+
+def load(t):
+    """
+    Fraction of full load at t seconds of simulated time.
+    """
+    return load_steps[int(t // step_time) % len(load_steps)]
+
+
+def _channels(argument):
+    """
+    Channels of a (@101,102,...) or (@101:105) list.
+    """
+    inside = argument[argument.index('(@') + 2:argument.index(')')]
+    channels = []
+    for part in inside.split(','):
+        if ':' in part:
+            first, last = part.split(':')
+            channels += [str(channel) for channel in range(int(first), int(last) + 1)]
+        else:
+            channels.append(part.strip())
+    return channels
+
+
+class SimulatedInstrument:
+    """
+    Common part of the simulated instruments: command parsing, latency, ASCII and binary replies.
+    Subclasses handle commands in _command and return the readings of a query from _query.
+    """
+    model = 'SIMULATED'
+
+    def __init__(self, resource_name, latency=0.002, reading_time=0.0, speed=1.0, noise=0.01, seed=None):
+        self.resource_name = resource_name
+        self.latency = latency
+        self.reading_time = reading_time
+        self.speed = speed
+        self.noise = noise
+        self.rng = np.random.default_rng(seed)
+        self.timeout = 2000
+        self.binary = False
+        self.start = time.monotonic()
+        self.queries = 0
+
+    def now(self):
+        """
+        Simulated time in seconds since the instrument was opened.
+        """
+        return (time.monotonic() - self.start) * self.speed
+
+    def close(self):
+        pass
+
+    def write(self, command):
+        for part in command.split(';'):
+            part = part.strip().lstrip(':')  # ':' starts a joined command from the root of the command tree
+            if part:
+                self._write(part)
+
+    def _write(self, command):
+        upper = command.upper()
+        if upper.startswith('FORM:DATA'):
+            self.binary = 'REAL' in upper
+        else:
+            self._command(upper)
+
+    def _command(self, command):
+        pass
+
+    def _readings(self, command):
+        """
+        Wait like the instrument would and return the readings of a query.
+        """
+        self.queries += 1
+        readings = self._query(command.strip().upper())
+        if readings is None:
+            raise pyvisa.errors.VisaIOError(pyvisa.constants.StatusCode.error_timeout)
+        time.sleep(self.latency + self.reading_time * self._measurements(readings))
+        return readings
+
+    def _query(self, command):
+        return None
+
+    def _measurements(self, readings):
+        """
+        Number of measurements taken to answer a query (text replies such as DATA:POIN? take none).
+        """
+        return 0 if isinstance(readings, str) else len(readings)
+
+    def query(self, command):
+        if command.strip().upper() == '*IDN?':
+            self.queries += 1
+            time.sleep(self.latency)
+            return f'Keysight Technologies,{self.model},{self.resource_name.split("::")[3]},SIM\n'
+        readings = self._readings(command)
+        if isinstance(readings, str):
+            return readings + '\n'
+        return ','.join(f'{value:+.9E}' for value in readings) + '\n'
+
+    def query_binary_values(self, command, datatype='f', is_big_endian=False, container=list):
+        readings = self._readings(command)
+        # Encoded and decoded like a real block so the binary path costs what it does on the bench
+        block = struct.pack(f"{'>' if is_big_endian else '<'}{len(readings)}{datatype}", *readings)
+        return container(np.frombuffer(block, dtype=f"{'>' if is_big_endian else '<'}{datatype}").astype(float))
+
+
+class SimulatedDAQ973A(SimulatedInstrument):
+    """
+    Thermocouple scanner. Channel n warms up by 10 + (n % 20) °C with a time constant of 300 + 20 * (n % 20) s.
+    """
+    model = 'DAQ973A'
+
+    def __init__(self, resource_name, reading_time=0.005, **kwargs):
+        super().__init__(resource_name, reading_time=reading_time, **kwargs)
+        self.scan = []
+        self.fahrenheit = set()
+        self.time_stamps = False
+        self.last_sweep = None
+
+    def temperature(self, channel, t):
+        n = int(channel) % 20
+        rise = (10 + n) * (1 - np.exp(-t / (300 + 20 * n)))
+        celsius = ambient + rise + self.rng.normal(0, self.noise * 10)
+        return celsius * 9 / 5 + 32 if channel in self.fahrenheit else celsius
+
+    def sweep(self):
+        t = self.now()
+        # Always scanned in ascending channel order, like the real DAQ
+        readings = []
+        stamp = time.time()
+        for channel in sorted(self.scan, key=int):
+            readings.append(self.temperature(channel, t))
+            if self.time_stamps:
+                wall = time.localtime(stamp)
+                readings += [wall.tm_year, wall.tm_mon, wall.tm_mday, wall.tm_hour, wall.tm_min,
+                             wall.tm_sec + stamp % 1]
+        return readings
+
+    def _command(self, command):
+        if command.startswith('ROUT:SCAN'):
+            self.scan = _channels(command)
+        elif command.startswith('UNIT:TEMP'):
+            for channel in _channels(command):
+                if command.split()[1].startswith('F'):
+                    self.fahrenheit.add(channel)
+                else:
+                    self.fahrenheit.discard(channel)
+        elif command.startswith('FORM:READ:TIME '):
+            self.time_stamps = command.endswith('ON')
+        elif command == 'INIT' and self.scan:
+            self.last_sweep = self.sweep()
+
+    def _measurements(self, readings):
+        # With time stamps every reading comes with its six time fields
+        return max(1, len(readings) // 7) if self.time_stamps else len(readings)
+
+    def _query(self, command):
+        if command.startswith('MEAS:TEMP?'):
+            return [self.temperature(channel, self.now()) for channel in _channels(command)]
+        if command == 'READ?':
+            return self.sweep() if self.scan else None
+        if command == 'FETCH?':
+            return self.last_sweep
+        return None
+
+
+class SimulatedDMM34465A(SimulatedInstrument):
+    """
+    DC voltmeter. level(load) is the reading at a load fraction, the default is the DC output
+    voltage; the shunt meter is opened with the shunt level (5000 A/V, so 100 A is 20 mV).
+    """
+    model = '34465A'
+
+    def __init__(self, resource_name, level=None, **kwargs):
+        super().__init__(resource_name, **kwargs)
+        self.level = level or (lambda fraction: dc_voltage)
+        self.timed = False
+        self.sample_interval = 0.001
+        self.sample_count = 1
+        self.init_time = None
+        self.removed = 0
+        self.triggered = None
+        self.trigger_source = 'IMM'
+        self.armed = False
+
+    def voltage(self, t):
+        return self.level(load(t)) * (1 + self.rng.normal(0, self.noise / 10))
+
+    def _command(self, command):
+        if command.startswith('SAMP:SOUR'):
+            self.timed = command.endswith('TIM')
+        elif command.startswith('SAMP:TIM'):
+            self.sample_interval = float(command.split()[1])
+        elif command.startswith('SAMP:COUN'):
+            self.sample_count = int(float(command.split()[1]))
+        elif command.startswith('CONF:'):
+            self.timed = False
+        elif command.startswith('TRIG:SOUR'):
+            self.trigger_source = command.split()[1]
+        elif command == 'INIT':
+            # Timed sampling starts right away on an immediate trigger, else on *TRG
+            # (an external trigger is taken to arrive at once)
+            self.armed = self.trigger_source == 'BUS'
+            self.init_time = None if self.armed else time.monotonic()
+            self.removed = 0
+            self.triggered = None
+        elif command == '*TRG':
+            self.triggered = self.voltage(self.now())
+            if self.armed:
+                self.init_time = time.monotonic()
+                self.armed = False
+        elif command == 'ABOR':
+            self.init_time = None
+            self.armed = False
+
+    def points(self):
+        if self.init_time is None or not self.timed:
+            return 0
+        taken = min(int((time.monotonic() - self.init_time) / self.sample_interval), self.sample_count)
+        return taken - self.removed
+
+    def _query(self, command):
+        if command.startswith('MEAS:VOLT:DC?') or command == 'READ?':
+            return [self.voltage(self.now())]
+        if command == 'FETCH?':
+            # A bus trigger that was never sent reads like an external trigger arriving now
+            return [self.triggered if self.triggered is not None else self.voltage(self.now())]
+        if command == 'DATA:POIN?':
+            return str(self.points())
+        if command.startswith('DATA:REM?'):
+            count = min(int(command.split()[1].split(',')[0]), self.points())
+            if count == 0:
+                return None
+            start = (self.init_time - self.start) * self.speed
+            times = start + (self.removed + np.arange(count)) * self.sample_interval * self.speed
+            self.removed += count
+            return [self.voltage(t) for t in times]
+        return None
+
+
+class SimulatedPowerMeter(SimulatedInstrument):
+    """
+    Three-phase power meter on the AC input: total power is the DC power over efficiency,
+    split evenly over the phases at 230 V. Power items are returned in W, like the meter.
+    """
+    model = 'WT'
+
+    def _query(self, command):
+        if command == ':NUM:NORM:VAL?':
+            dc_power = dc_voltage * full_load_current * load(self.now())
+            total = dc_power / efficiency * (1 + self.rng.normal(0, self.noise / 10))
+            phases = total / 3 * (1 + self.rng.normal(0, self.noise / 10, 3))
+            volts = 230 * (1 + self.rng.normal(0, self.noise / 10, 3))
+            values = []
+            for volt, power in zip(volts, phases):
+                values += [volt, power / volt, power]
+            return values + [phases.sum()]
+        return None
+
+
+class ResourceManager:
+    """
+    Drop-in for pyvisa.ResourceManager() that opens simulated instruments.
+    Keyword arguments (latency, speed, noise, seed ...) are passed to every instrument opened.
+    """
+    def __init__(self, resources=default_resources, **kwargs):
+        self.resources = tuple(resources)
+        self.kwargs = kwargs
+        self.dmms_opened = 0
+
+    def list_resources(self, query='?*::INSTR'):
+        return self.resources
+
+    def open_resource(self, resource_name, **kwargs):
+        product = int(resource_name.split('::')[2], 0)
+        options = {**self.kwargs, **kwargs}
+        if product == DAQ973A:
+            return SimulatedDAQ973A(resource_name, **options)
+        if product == DMM34465A:
+            # The first meter opened reads the DC output, the second the shunt (as in the Dual DMM logger)
+            self.dmms_opened += 1
+            if self.dmms_opened % 2 == 0:
+                options.setdefault('level', lambda fraction: full_load_current * fraction / 5000)
+            return SimulatedDMM34465A(resource_name, **options)
+        if product == POWER_METER:
+            return SimulatedPowerMeter(resource_name, **options)
+        raise pyvisa.errors.VisaIOError(pyvisa.constants.StatusCode.error_resource_not_found)
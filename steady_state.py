@@ -0,0 +1,77 @@
+"""
+Thermal steady-state detection for the DAQ loggers.
+
+A channel is stable when its rate of change, the least squares slope of its
+readings over the last window seconds, is below rate (°C/min). Steady state
+is reached once every monitored channel has been stable for hold seconds in
+a row (at once with hold=0). The slope is fitted to every sweep of the
+window, so thermocouple noise does not read as a change the way the
+difference of two sweeps would.
+
+Only the sweeps of the last window are kept.
+"""
+from collections import deque
+
+import numpy as np
+
+
+class Detector:
+    """
+    Steady-state detector over the channels in names (monitored: the names to watch, all of them if None).
+    Call update after every sweep.
+    """
+    def __init__(self, names, monitored=None, rate=0.1, window=600.0, hold=0.0):
+        self.names = list(names)
+        self.monitored = [self.names.index(channel) for channel in (monitored if monitored is not None else self.names)]
+        self.rate = rate  # °C/min
+        self.window = window  # seconds
+        self.hold = hold  # seconds
+        self.times = deque()
+        self.sweeps = deque()
+        self.full = False  # True once the sweeps span a whole window
+        self.rates = np.full(len(self.monitored), np.nan)  # °C/min of each monitored channel, NaN until a full window
+        self.stable_since = None  # time every channel became stable
+        self.reached_at = None  # time steady state was reached
+
+    def update(self, t, sweep):
+        """
+        Add the sweep taken t seconds into the run. Returns True once steady state has been reached.
+        """
+        self.times.append(t)
+        self.sweeps.append(np.asarray(sweep, dtype=float)[self.monitored])
+        while t - self.times[0] > self.window:
+            self.times.popleft()
+            self.sweeps.popleft()
+            self.full = True
+        if self.reached_at is not None:
+            return True
+
+        if not self.full or len(self.times) < 3:
+            return False
+        times = np.array(self.times) - t
+        times -= times.mean()
+        readings = np.array(self.sweeps)
+        self.rates = times @ (readings - readings.mean(axis=0)) / (times @ times) * 60
+
+        if np.all(np.abs(self.rates) < self.rate):  # NaN (open thermocouple) is never stable
+            if self.stable_since is None:
+                self.stable_since = t
+            if t - self.stable_since >= self.hold:
+                self.reached_at = t
+        else:
+            self.stable_since = None
+        return self.reached_at is not None
+
+    def status(self):
+        """
+        One line for the console: the fastest changing channel and how close to steady state the run is.
+        """
+        if np.all(np.isnan(self.rates)):
+            return f'Steady state: waiting for a full {self.window / 60:g} min window'
+        worst = int(np.nanargmax(np.abs(self.rates)))
+        line = f'Steady state: fastest change {self.rates[worst]:+.3f} °C/min ({self.names[self.monitored[worst]]}), limit {self.rate:g} °C/min'
+        if self.reached_at is not None:
+            return f'{line}, reached at {self.reached_at / 60:.1f} min'
+        if self.stable_since is not None:
+            return f'{line}, stable for {(self.times[-1] - self.stable_since) / 60:.1f} of {self.hold / 60:.1f} min'
+        return line
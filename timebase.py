@@ -0,0 +1,127 @@
+"""
+One clock for every sample of a run.
+
+The wall clock is read once at start and every sample time after that comes
+from time.monotonic_ns(), so sample times have sub-microsecond resolution,
+never jump when the PC clock is adjusted and keep counting across midnight.
+
+dates_to_seconds and times_to_seconds turn the Date and Time columns of the
+logger and power meter CSVs back into seconds, a whole column at a time
+(date_seconds and time_seconds one value at a time). asof_join matches
+times of one instrument to the nearest readings of another.
+"""
+import time
+from datetime import datetime, timedelta
+from functools import lru_cache
+
+import numpy as np
+
+# Date formats tried in order for the Date columns
+date_formats = ['%m/%d/%Y', '%Y/%m/%d', '%Y-%m-%d', '%m/%d/%y']
+
+
+class Clock:
+    """
+    Monotonic clock tied once to the wall clock.
+    """
+    def __init__(self):
+        self.start_wall = datetime.now()
+        self.start_ns = time.monotonic_ns()
+
+    def now(self):
+        """
+        Return (seconds since start, wall clock datetime) of the current instant.
+        """
+        elapsed = (time.monotonic_ns() - self.start_ns) / 1e9
+        return elapsed, self.start_wall + timedelta(seconds=elapsed)
+
+
+def from_fields(year, month, day, hour, minute, second):
+    """
+    Build a datetime from the six time fields the DAQ973A appends to a reading (FORM:READ:TIME:TYPE ABS).
+    second is fractional.
+    """
+    return datetime(int(year), int(month), int(day), int(hour), int(minute)) + timedelta(seconds=float(second))
+
+
+@lru_cache(maxsize=None)
+def date_seconds(date_str):
+    """
+    Seconds from 1970-01-01 to the start of the given date (dates repeat, so results are cached).
+    """
+    for date_format in date_formats:
+        try:
+            return (datetime.strptime(date_str.strip(), date_format) - datetime(1970, 1, 1)).total_seconds()
+        except ValueError:
+            continue
+    raise ValueError(f"Invalid date format: {date_str}")
+
+
+def time_seconds(time_str):
+    """
+    Seconds since midnight of one time, same rules as times_to_seconds.
+    """
+    clock = time_str.strip().upper()
+    is_pm = clock.endswith('PM')
+    is_12_hour = is_pm or clock.endswith('AM')
+    try:
+        hours, minutes, seconds = map(float, clock.rstrip('APM').strip().split(':'))
+    except ValueError:
+        raise ValueError(f"Invalid time format: {time_str}")
+    if is_12_hour:
+        hours = hours % 12 + 12 * is_pm
+    return hours * 3600 + minutes * 60 + seconds
+
+
+def asof_join(pm_times, com_times, tolerance, interpolate=False):
+    """
+    Find the power meter rows to use for every multimeter time (both in seconds, pm_times sorted).
+
+    Returns (left, right, weight, matched): the values for multimeter row k are
+    pm_values[left[k]] * (1 - weight[k]) + pm_values[right[k]] * weight[k].
+    Without interpolate the weight is 0 or 1, which picks the nearest row.
+    matched is False where the nearest power meter time is more than tolerance away.
+    """
+    right = np.searchsorted(pm_times, com_times)  # first power meter time at or after each multimeter time
+    left = np.clip(right - 1, 0, len(pm_times) - 1)
+    inside = right < len(pm_times)
+    right = np.clip(right, 0, len(pm_times) - 1)
+
+    d_left = np.abs(com_times - pm_times[left])
+    d_right = np.abs(pm_times[right] - com_times)
+    matched = np.minimum(d_left, d_right) <= tolerance
+
+    if interpolate:
+        gap = pm_times[right] - pm_times[left]
+        weight = np.divide(com_times - pm_times[left], gap, out=np.zeros(len(com_times)), where=gap > 0)
+        weight = np.clip(weight, 0, 1)
+    else:
+        weight = ((d_right < d_left) & inside).astype(float)
+    return left, right, weight, matched
+
+
+def dates_to_seconds(date_strs):
+    """
+    Convert an array of dates to seconds from 1970-01-01, parsing every distinct date only once.
+    """
+    unique_dates, inverse = np.unique(np.asarray(date_strs, dtype=str), return_inverse=True)
+    return np.array([date_seconds(date_str) for date_str in unique_dates])[inverse]
+
+
+def times_to_seconds(time_strs):
+    """
+    Convert an array of times to seconds since midnight in one bulk step.
+    Same rules as Combine_AC_DC.convert_time: 12-hour times with AM/PM or 24-hour times, seconds may have a fraction.
+    Every distinct time is only parsed once (a logger writes many rows per second).
+    """
+    unique_times, inverse = np.unique(np.asarray(time_strs, dtype=str), return_inverse=True)
+    times = np.char.upper(np.char.strip(unique_times))
+    is_pm = np.char.endswith(times, 'PM')
+    is_12_hour = is_pm | np.char.endswith(times, 'AM')
+    clock = np.char.strip(np.char.rstrip(times, 'APM'))
+    try:
+        hms = np.array(np.char.split(clock, ':').tolist(), dtype=float).reshape(len(clock), 3)
+    except ValueError:
+        raise ValueError(f"Invalid time format in: {time_strs[:5]}")
+    hours = np.where(is_12_hour, hms[:, 0] % 12 + 12 * is_pm, hms[:, 0])
+    return (hours * 3600 + hms[:, 1] * 60 + hms[:, 2])[inverse]